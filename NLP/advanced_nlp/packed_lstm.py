@@ -0,0 +1,177 @@
+'''Packed-Sequence LSTM Text Classifier with a Length-Bucketed DataLoader
+The LSTM examples in rnn_lstm_basics.py feed fixed-shape padded tensors to nn.LSTM. With real text the lengths vary a lot:
+if a batch is padded to 400 tokens but most sentences have 20, the LSTM spends most of its time on padding, and the
+"final" hidden state is the state after the padding, not after the last real word.
+PackedLSTMClassifier packs every batch with pack_padded_sequence, so nn.LSTM stops at each sequence's true length.
+BucketBatchSampler groups sequences of similar length into the same batch and pad_collate pads a batch only up to its
+own longest sequence, so there is little padding to skip in the first place.'''
+'''Key Concepts:
+pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False): flattens a padded batch into the real timesteps only;
+  at step t the LSTM processes just the sequences that are still running. hidden[-1] is the state after each sequence's last token.
+Bucketing: shuffle, cut into pools of batch_size * pool_batches sequences, sort each pool by length, split into batches,
+  shuffle the batch order. Batches stay random across epochs but their sequences have similar lengths.
+collate_fn: turns a list of (token_ids, label) into a padded (batch, longest_in_batch) tensor + lengths + labels.
+TorchScript: torch.jit.script(model) compiles forward() for inference (no Python overhead per call, loadable without the class code).'''
+import random
+import time
+
+import torch
+import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_sequence
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+
+class SequenceDataset(Dataset):
+    """Variable-length token-ID sequences (lists or 1-D tensors) with one label each."""
+
+    def __init__(self, sequences, labels):
+        self.sequences = [torch.as_tensor(s, dtype=torch.long) for s in sequences]
+        self.labels = torch.as_tensor(labels, dtype=torch.float32)
+        self.lengths = [len(s) for s in self.sequences]
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __getitem__(self, i):
+        return self.sequences[i], self.labels[i]
+
+
+class BucketBatchSampler(Sampler):
+    """Batches of indices whose sequences have similar lengths (pass as DataLoader(batch_sampler=...))."""
+
+    def __init__(self, lengths, batch_size, pool_batches=50, shuffle=True, drop_last=False, seed=0):
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.pool_size = batch_size * pool_batches
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rng = random.Random(seed)
+
+    def __iter__(self):
+        indices = list(range(len(self.lengths)))
+        if self.shuffle:
+            self.rng.shuffle(indices)
+        batches = []
+        for start in range(0, len(indices), self.pool_size):
+            pool = sorted(indices[start:start + self.pool_size], key=self.lengths.__getitem__)
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size))
+        if self.drop_last:
+            batches = [batch for batch in batches if len(batch) == self.batch_size]
+        if self.shuffle:
+            self.rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        pools, rest = divmod(len(self.lengths), self.pool_size)
+        return pools * -(-self.pool_size // self.batch_size) + -(-rest // self.batch_size)
+
+
+def pad_collate(batch, padding_value=0):
+    """[(token_ids, label), ...] -> (padded ids (batch, longest_in_batch), lengths, labels (batch, 1))"""
+    sequences, labels = zip(*batch)
+    lengths = torch.tensor([len(s) for s in sequences], dtype=torch.long)
+    padded = pad_sequence(sequences, batch_first=True, padding_value=padding_value)
+    return padded, lengths, torch.stack(labels).unsqueeze(1)
+
+
+class PackedLSTMClassifier(nn.Module):
+    def __init__(self, vocab_size, embed_dim, hidden_size, output_size, num_layers=1, bidirectional=False,
+                 padding_idx=0):
+        super().__init__()
+        self.embedding = nn.Embedding(vocab_size, embed_dim, padding_idx=padding_idx)
+        self.lstm = nn.LSTM(embed_dim, hidden_size, num_layers=num_layers, batch_first=True,
+                            bidirectional=bidirectional)
+        self.bidirectional = bidirectional
+        self.fc = nn.Linear(hidden_size * (2 if bidirectional else 1), output_size)
+
+    def forward(self, tokens, lengths):
+        # tokens: (batch_size, seq_len) token ids, lengths: (batch_size,) true lengths
+        packed = pack_padded_sequence(self.embedding(tokens), lengths.cpu(), batch_first=True, enforce_sorted=False)
+        _, (hidden, _) = self.lstm(packed)
+        # with enforce_sorted=False, hidden comes back in the original batch order
+        if self.bidirectional:
+            return self.fc(torch.cat([hidden[-2], hidden[-1]], dim=1))
+        return self.fc(hidden[-1])
+
+    def forward_padded(self, tokens):
+        """Baseline: the LSTM runs over every (padded) timestep, as in rnn_lstm_basics.py."""
+        _, (hidden, _) = self.lstm(self.embedding(tokens))
+        if self.bidirectional:
+            return self.fc(torch.cat([hidden[-2], hidden[-1]], dim=1))
+        return self.fc(hidden[-1])
+
+
+def script_for_inference(model):
+    """TorchScript-compiled copy of the model in eval mode; save with torch.jit.save, load with torch.jit.load."""
+    return torch.jit.script(model.eval())
+
+
+def make_loader(dataset, batch_size=64, shuffle=True, bucket=True, num_workers=0):
+    if bucket:
+        sampler = BucketBatchSampler(dataset.lengths, batch_size, shuffle=shuffle)
+        return DataLoader(dataset, batch_sampler=sampler, collate_fn=pad_collate, num_workers=num_workers)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, collate_fn=pad_collate, num_workers=num_workers)
+
+
+def train_epoch(model, loader, criterion, optimizer):
+    model.train()
+    total = 0.0
+    for tokens, lengths, labels in loader:
+        optimizer.zero_grad()
+        loss = criterion(model(tokens, lengths), labels)
+        loss.backward()
+        optimizer.step()
+        total += loss.item() * len(labels)
+    return total / len(loader.dataset)
+
+
+@torch.no_grad()
+def sequences_per_second(predict, loader):
+    n, start = 0, time.perf_counter()
+    for tokens, lengths, _ in loader:
+        predict(tokens, lengths)
+        n += len(tokens)
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    random.seed(0)
+    torch.set_num_threads(1)
+
+    # synthetic "text": token ids, long-tailed lengths (most short, a few long); label = token 7 appears
+    vocab_size, max_len = 5000, 400
+    lengths = [min(max_len, max(3, int(random.lognormvariate(3.2, 0.8)))) for _ in range(6000)]
+    sequences = [[random.randrange(1, vocab_size) for _ in range(n)] for n in lengths]
+    labels = [float(7 in s) for s in sequences]
+    dataset = SequenceDataset(sequences, labels)
+    print(f"{len(dataset)} sequences, mean length {sum(lengths) / len(lengths):.0f}, max {max(lengths)}")
+
+    model = PackedLSTMClassifier(vocab_size, embed_dim=64, hidden_size=128, output_size=1)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.005)
+    criterion = nn.BCEWithLogitsLoss()
+    start = time.perf_counter()
+    loss = train_epoch(model, make_loader(dataset, batch_size=64), criterion, optimizer)
+    print(f"1 training epoch, bucketed + packed: {time.perf_counter() - start:.1f}s, loss {loss:.4f}")
+
+    # inference throughput on CPU
+    model.eval()
+    padded_to_max = make_loader(dataset, batch_size=64, shuffle=False, bucket=False)
+    fixed = lambda tokens, lengths: model.forward_padded(
+        nn.functional.pad(tokens, (0, max_len - tokens.shape[1])))  # every batch padded to max_len
+    print(f"padded to {max_len}, random batches:     {sequences_per_second(fixed, padded_to_max):,.0f} seq/s")
+    random_batches = make_loader(dataset, batch_size=64, shuffle=True, bucket=False)
+    print(f"packed, random batches:             {sequences_per_second(model, random_batches):,.0f} seq/s")
+    bucketed = make_loader(dataset, batch_size=64, shuffle=True)
+    print(f"packed, length-bucketed batches:    {sequences_per_second(model, bucketed):,.0f} seq/s")
+    scripted = script_for_inference(model)
+    print(f"packed + bucketed + TorchScript:    {sequences_per_second(scripted, bucketed):,.0f} seq/s")
+
+    # packing does not change the result for a sequence, padding does
+    tokens, lengths, _ = next(iter(random_batches))
+    with torch.no_grad():
+        one_by_one = torch.cat([model(tokens[i:i + 1, :lengths[i]], lengths[i:i + 1]) for i in range(4)])
+        print("packed batch == one by one:", torch.allclose(model(tokens, lengths)[:4], one_by_one, atol=1e-5))
+        print("scripted == eager:", torch.allclose(scripted(tokens, lengths), model(tokens, lengths), atol=1e-5))
@@ -109,6 +109,7 @@ class SequenceSumClassifier(nn.Module):
         # hidden: (num_layers * num_directions, batch_size, hidden_size)
         # For 1 layer, unidirectional: hidden[-1,:,:] -> (batch_size, hidden_size)
         return self.fc(hidden[-1,:,:])
+# (variable-length text: packed_lstm.py packs each batch so the LSTM skips padding, with length-bucketed batches)
 
 task_model = SequenceSumClassifier(input_size=1, hidden_size=10, output_size=1)
 task_criterion = nn.BCEWithLogitsLoss()
@@ -21,6 +21,7 @@ vectorizer = TfidfVectorizer()
 x = vectorizer.fit_transform(documents)
 print("\n--- Step 2: TF-IDF Features Created ---")
 print(x.toarray())  # Each row is a vector for a document
+# (large corpora: ../text_features/hashed_tfidf.py builds hashed TF-IDF shards on disk without densifying)
 
 # Step 3: Train-Test Split
 from sklearn.model_selection import train_test_split
@@ -46,6 +47,7 @@ print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
 print("Classification Report:\n", classification_report(y_test, y_pred))
 
 # Try with Logistic Regression
+# (several candidate models on one corpus: ../../sklearn/classification/spam_training.py shares one TF-IDF matrix and fits them in parallel)
 from sklearn.linear_model import LogisticRegression
 logreg = LogisticRegression()
 logreg.fit(x_train,y_train)
@@ -6,10 +6,13 @@ Versatility: Supports a wide range of NLP tasks.'''
 
 # sentiment analysis pipeline
 '''Determines the emotional tone of a piece of text (e.g., positive, negative, neutral). The pipeline loads a pre-trained model specifically fine-tuned for this task.'''
-from transformers import pipeline
+# pipeline(...) from transformers loads the model immediately. The registry (pipeline_registry.py) only loads a task's model
+# the first time it is called, shares weights between tasks on the same checkpoint and evicts unused models.
+from pipeline_registry import default_registry
+registry = default_registry()
 print(f"--- Hugging Face Pipeline: Sentiment Analysis ---")
 # 1. Initialize the sentiment-analysis pipeline
-sentiment_classifier = pipeline("sentiment-analysis")
+sentiment_classifier = registry.lazy("sentiment-analysis")
 # 2. Analyze text
 texts = [
     "I love using Hugging Face pipelines, they are so easy!",
@@ -17,6 +20,8 @@ texts = [
     "The movie was okay, not great, not bad.",
     "What a wonderful day to learn NLP!"
 ]
+# Here all texts are known up front. When requests arrive one by one, microbatch_server.py
+# groups them into batches (max size or few-ms deadline) instead of running batches of size 1.
 results = sentiment_classifier(texts)
 # 3. Print results
 print("\nSentiment Analysis Results:")
@@ -28,7 +33,7 @@ for text,result in zip(texts,results):
 
 # Named Entity Recognition (NER) Pipeline
 print("\n--- Hugging Face Pipeline: Named Entity Recognition (NER) ---")
-ner_recognizer = pipeline("ner", grouped_entities=True) # grouped_entities merges subword tokens
+ner_recognizer = registry.lazy("ner") # registered with aggregation_strategy="simple", merges subword tokens
 text_for_ner = "My name is John Doe, and I work at Google in Mountain View, California. I visited Paris last year."
 results = ner_recognizer(text_for_ner)
 
@@ -43,7 +48,7 @@ for entity in results:
 
 # Text Summarization Pipeline
 print("\n--- Hugging Face Pipeline: Text Summarization ---")
-summarizer = pipeline("summarization")
+summarizer = registry.lazy("summarization")
 long_text = """
 Hugging Face is an American company that develops tools for building, training, and
 deploying machine learning models. It is known for its Transformers library, which
@@ -61,7 +66,7 @@ print(summary_results[0]['summary_text'])
 
 # Machine Translation Pipeline
 print("\n--- Hugging Face Pipeline: Machine Translation ---")
-translator_en_fr = pipeline("translation_en_to_fr")
+translator_en_fr = registry.lazy("translation_en_to_fr")
 english_texts = [
     "Hello, how are you today?",
     "Machine learning is a fascinating field.",
@@ -75,7 +80,7 @@ for eng_text, result in zip(english_texts, translated_results):
 
 # Question Answering (QA) Pipeline
 print("\n--- Hugging Face Pipeline: Question Answering ---")
-qa_model = pipeline("question-answering")
+qa_model = registry.lazy("question-answering")
 context = """
 The Amazon rainforest is the largest tropical rainforest in the world.
 It covers an area of approximately 6.7 million square kilometers
@@ -101,7 +106,7 @@ Key Concepts:
 Prompt/Seed: The initial text given to the model to start generation.
 Autoregressive Models: Models like GPT (Generative Pre-trained Transformer) generate text one token at a time, using previously generated tokens as part of the context for the next token.'''
 print("\n--- Hugging Face Pipeline: Text Generation ---")
-generator = pipeline("text-generation", model="gpt2")
+generator = registry.lazy("text-generation") # registered with model="gpt2"
 prompt = "The future of AI is bright because"
 generated_texts = generator(
     prompt,
@@ -131,7 +136,7 @@ print(f"  Generated Story: '{story_results[0]['generated_text']}'")
 Masked Language Modeling (MLM): The pre-training task where the model learns to predict masked words based on their context.
 tokenizer.mask_token: A special token (usually [MASK]) used to indicate the position of the word to be predicted.'''
 print("\n--- Hugging Face Pipeline: Fill-Mask ---")
-unmasker = pipeline("fill-mask")
+unmasker = registry.lazy("fill-mask")
 text_with_mask = "The capital of France is the [MASK] city of Paris."
 mask_results = unmasker(text_with_mask, top_k=3) # Get top 3 predictions
 print(f"\nSentence with mask: '{text_with_mask}'")
@@ -153,9 +158,11 @@ for result in another_mask_results:
 NLI (Natural Language Inference): Underlying task for many zero-shot models. The model determines if a text "entails," "contradicts," or is "neutral" to a given hypothesis. Zero-shot classification converts the input text and labels into NLI problems.
 Flexibility: You can define new categories on the fly without retraining the model.'''
 print("\n--- Hugging Face Pipeline: Zero-Shot Classification ---")
-classifier_zero_shot = pipeline("zero-shot-classification")
+classifier_zero_shot = registry.lazy("zero-shot-classification")
 text_to_classify = "This is a great product and I really enjoyed using it."
 candidate_labels = ["positive", "negative", "neutral", "anger", "joy"]
+# Every call re-tokenizes one hypothesis per label. For a fixed label set over many texts see
+# zero_shot_engine.py (hypotheses cached once, NLI pairs of many texts packed into big batches).
 zero_shot_results = classifier_zero_shot(text_to_classify, candidate_labels)
 print(f"\nText: '{text_to_classify}'")
 print(f"Candidate Labels: {candidate_labels}")
@@ -174,4 +181,9 @@ print(f"Candidate Labels: {candidate_news_labels}")
 print("\nZero-Shot Classification Results (ranked by score):")
 sorted_news_results = sorted(zip(news_results['labels'], news_results['scores']), key=lambda x: x[1], reverse=True)
 for label, score in sorted_news_results:
-    print(f"  - {label}: {score:.4f}")
\ No newline at end of file
+    print(f"  - {label}: {score:.4f}")
+
+# Load time and resident memory per task
+print("\n--- Pipeline Registry Stats ---")
+for name, stats in registry.stats().items():
+    print(f"  {name}: loaded={stats['loaded']}, load={stats['load_seconds']:.1f}s, memory={stats['resident_mb']:.0f} MB, calls={stats['calls']}")
@@ -0,0 +1,163 @@
+'''Dynamic Micro-Batching for Transformer Pipelines
+In hf_pipeline_example.py the sentiment and zero-shot pipelines get a ready-made Python list. In production requests arrive one at a time,
+so every request runs through the model as a batch of size 1 and the model spends most of its time on per-call overhead.
+MicroBatcher puts incoming requests on a per-task queue and flushes a batch when it is full OR when a small deadline (a few ms) expires.
+The model runs on a worker thread (so the event loop stays responsive) and every caller's future gets exactly its own result.'''
+'''Key Concepts:
+Max batch size: upper bound on a batch, keeps latency and memory predictable.
+Max wait (deadline): how long the first request of a batch may wait for company. Trades a few ms of latency for much higher throughput.
+Per-task queues: requests for different tasks (or different kwargs, e.g. zero-shot candidate labels) are never mixed in one batch.
+Worker thread: model calls block, so they run in a ThreadPoolExecutor via loop.run_in_executor.
+Backpressure: queues are bounded (max_queue); when full, submit() waits instead of piling up unbounded work.'''
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class MicroBatcher:
+    """get_pipeline: callable task name -> pipeline (e.g. PipelineRegistry.get)."""
+
+    def __init__(self, get_pipeline, max_batch_size=32, max_wait_ms=5.0, max_queue=1024, executor=None):
+        self.get_pipeline = get_pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self._queues = {}
+        self._workers = {}
+        self.batch_sizes = []
+
+    async def submit(self, task, item, **kwargs):
+        """Queue one input and wait for its result."""
+        key = (task, _freeze(kwargs))
+        if key not in self._queues:
+            self._queues[key] = asyncio.Queue(maxsize=self.max_queue)
+            self._workers[key] = asyncio.create_task(self._worker(task, kwargs, self._queues[key]))
+        future = asyncio.get_running_loop().create_future()
+        await self._queues[key].put((item, future))  # blocks when the queue is full (backpressure)
+        return await future
+
+    async def _worker(self, task, kwargs, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            self.batch_sizes.append(len(items))
+            try:
+                results = await loop.run_in_executor(self.executor, self._run, task, items, kwargs)
+                if len(results) != len(items):  # zip() would silently leave callers waiting forever
+                    raise RuntimeError(f"pipeline {task!r} returned {len(results)} results for {len(items)} inputs")
+            except Exception as exc:  # every caller of a failed batch gets the error
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():  # caller may have been cancelled meanwhile
+                    future.set_result(result)
+
+    def _run(self, task, items, kwargs):
+        results = self.get_pipeline(task)(items, batch_size=len(items), **kwargs)
+        # some pipelines return a single dict for a one-element list
+        return results if isinstance(results, list) else [results]
+
+    async def close(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        self.executor.shutdown(wait=False)
+
+
+# --- Load generator ---
+async def run_load(call, texts, requests_per_second, n_requests, seed=0):
+    """Open-loop load: requests arrive with exponential gaps (Poisson) no matter how slow the server is.
+    Returns throughput (req/s) and p50/p99 latency (ms)."""
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(1 / requests_per_second, size=n_requests)
+    latencies = []
+
+    async def one(text):
+        start = time.perf_counter()
+        await call(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    tasks = []
+    for i, gap in enumerate(gaps):
+        await asyncio.sleep(gap)
+        tasks.append(asyncio.create_task(one(texts[i % len(texts)])))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {"throughput": n_requests / elapsed, "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99))}
+
+
+async def benchmark(get_pipeline, task, texts, requests_per_second=200, n_requests=1000, **kwargs):
+    # current path: every request is its own pipeline call (batch of size 1) on the model thread
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_running_loop()
+
+    async def per_call(text):
+        return await loop.run_in_executor(executor, lambda: get_pipeline(task)([text], **kwargs))
+
+    baseline = await run_load(per_call, texts, requests_per_second, n_requests)
+    executor.shutdown()
+
+    batcher = MicroBatcher(get_pipeline, max_batch_size=32, max_wait_ms=5)
+    batched = await run_load(lambda text: batcher.submit(task, text, **kwargs), texts, requests_per_second, n_requests)
+    batched["mean_batch_size"] = float(np.mean(batcher.batch_sizes))
+    await batcher.close()
+    return baseline, batched
+
+
+if __name__ == "__main__":
+    from pipeline_registry import default_registry
+
+    registry = default_registry()
+    texts = [
+        "I love using Hugging Face pipelines, they are so easy!",
+        "This product is terrible and I'm very disappointed.",
+        "The movie was okay, not great, not bad.",
+        "What a wonderful day to learn NLP!",
+    ]
+    registry.get("sentiment-analysis")  # load before timing
+
+    async def main():
+        baseline, batched = await benchmark(registry.get, "sentiment-analysis", texts)
+        print("--- sentiment-analysis, 200 req/s offered ---")
+        print(f"  per-call:      {baseline['throughput']:.0f} req/s, p50={baseline['p50_ms']:.1f}ms, p99={baseline['p99_ms']:.1f}ms")
+        print(f"  micro-batched: {batched['throughput']:.0f} req/s, p50={batched['p50_ms']:.1f}ms, p99={batched['p99_ms']:.1f}ms "
+              f"(mean batch {batched['mean_batch_size']:.1f})")
+
+        # zero-shot: requests with the same candidate labels share batches
+        batcher = MicroBatcher(registry.get)
+        labels = ["positive", "negative", "neutral"]
+        results = await asyncio.gather(*(batcher.submit("zero-shot-classification", t, candidate_labels=labels) for t in texts))
+        for text, result in zip(texts, results):
+            print(f"  '{text}' -> {result['labels'][0]} ({result['scores'][0]:.2f})")
+        await batcher.close()
+
+    asyncio.run(main())
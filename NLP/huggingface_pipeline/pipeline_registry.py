@@ -0,0 +1,175 @@
+'''Pipeline Registry: Lazy, Shared and Memory-Bounded Hugging Face Pipelines
+hf_pipeline_example.py and transformers_intro.py build every pipeline(...) eagerly at import time: sentiment, NER, summarization, translation,
+QA, text generation, fill-mask and zero-shot. A process then needs ~8 GB and minutes of loading before it can answer a single request.
+The registry only remembers WHAT to load. A task's model is loaded the first time it is used, tasks that point to the same checkpoint
+share one tokenizer and one set of weights, and models that have not been used for a while are evicted when a memory budget is exceeded.'''
+'''Key Concepts:
+Lazy loading: registry.lazy("summarization") returns a callable handle; nothing is downloaded or loaded until it is first called.
+Sharing: the model is cached by (checkpoint, model class) and the tokenizer by checkpoint, so two tasks on the same checkpoint reuse the same weights.
+LRU eviction: every call marks the model as recently used; when resident memory goes over the budget the least recently used models are dropped.
+Stats: per task load time, resident memory of its model, number of calls and which other tasks share its weights.'''
+import gc
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+from transformers import AutoTokenizer, pipeline
+from transformers.pipelines import check_task
+
+
+def model_nbytes(model):
+    # count every storage once (tied embeddings share memory)
+    seen, total = set(), 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        ptr = tensor.untyped_storage().data_ptr()
+        if ptr not in seen:
+            seen.add(ptr)
+            total += tensor.untyped_storage().nbytes()
+    return total
+
+
+class LazyPipeline:
+    """Callable stand-in for a pipeline; resolves it from the registry on every call, so eviction is always safe."""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        return self.registry.get(self.name)(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyPipeline({self.name!r})"
+
+
+class PipelineRegistry:
+    def __init__(self, memory_budget_mb=4096, device=None):
+        self.memory_budget = memory_budget_mb * 1024 ** 2
+        self.device = device if device is not None else (0 if torch.cuda.is_available() else -1)
+        self._specs = {}  # name -> (task, checkpoint or None, pipeline kwargs)
+        self._pipelines = {}  # name -> pipeline object
+        self._models = OrderedDict()  # (checkpoint, model class name) -> model, most recently used last
+        self._model_bytes = {}
+        self._tokenizers = {}  # checkpoint -> tokenizer
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, task=None, model=None, **pipeline_kwargs):
+        """Remember how to build a pipeline. task defaults to name, model defaults to the task's default checkpoint."""
+        with self._lock:
+            self._specs[name] = (task or name, model, pipeline_kwargs)
+            self._stats[name] = {"task": task or name, "loaded": False, "load_seconds": 0.0, "resident_mb": 0.0,
+                                 "calls": 0, "evictions": 0, "shares_weights_with": []}
+        return self.lazy(name)
+
+    def lazy(self, name):
+        if name not in self._specs:
+            raise KeyError(f"Unknown pipeline {name!r}. Registered: {sorted(self._specs)}")
+        return LazyPipeline(self, name)
+
+    def _resolve(self, task, checkpoint):
+        normalized_task, targeted_task, task_options = check_task(task)
+        if checkpoint is None:
+            checkpoint, _ = targeted_task["default"]["model"]["pt"] if "model" in targeted_task["default"] \
+                else targeted_task["default"][task_options]["model"]["pt"]
+        model_class = targeted_task["pt"][0]
+        return checkpoint, model_class
+
+    def _model_key(self, name):
+        task, checkpoint, _ = self._specs[name]
+        checkpoint, model_class = self._resolve(task, checkpoint)
+        return (checkpoint, model_class.__name__), model_class
+
+    def get(self, name):
+        """The ready-to-use pipeline for name, loading (or re-loading after eviction) it if needed."""
+        with self._lock:
+            if name not in self._specs:
+                raise KeyError(f"Unknown pipeline {name!r}. Registered: {sorted(self._specs)}")
+            key, model_class = self._model_key(name)
+            self._stats[name]["calls"] += 1
+            if name in self._pipelines and key in self._models:
+                self._models.move_to_end(key)
+                return self._pipelines[name]
+
+            task, _, pipeline_kwargs = self._specs[name]
+            checkpoint = key[0]
+            start = time.perf_counter()
+            if checkpoint not in self._tokenizers:
+                self._tokenizers[checkpoint] = AutoTokenizer.from_pretrained(checkpoint)
+            if key not in self._models:
+                self._models[key] = model_class.from_pretrained(checkpoint)
+                self._model_bytes[key] = model_nbytes(self._models[key])
+            self._models.move_to_end(key)
+            self._pipelines[name] = pipeline(task, model=self._models[key], tokenizer=self._tokenizers[checkpoint],
+                                             device=self.device, **pipeline_kwargs)
+
+            stats = self._stats[name]
+            stats.update(loaded=True, load_seconds=stats["load_seconds"] + time.perf_counter() - start,
+                         resident_mb=self._model_bytes[key] / 1024 ** 2)
+            self._evict(keep=key)
+            return self._pipelines[name]
+
+    def _evict(self, keep):
+        # drop least recently used models until we are back under the budget (never the one just used)
+        while self.resident_bytes() > self.memory_budget and len(self._models) > 1:
+            key = next(k for k in self._models if k != keep)
+            del self._models[key]
+            del self._model_bytes[key]
+            for name in [n for n in self._pipelines if self._model_key(n)[0] == key]:
+                del self._pipelines[name]
+                self._stats[name].update(loaded=False, resident_mb=0.0)
+                self._stats[name]["evictions"] += 1
+            if not any(k[0] == key[0] for k in self._models):
+                self._tokenizers.pop(key[0], None)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def resident_bytes(self):
+        return sum(self._model_bytes.values())
+
+    def stats(self):
+        """Per-task load time, resident memory, call count and weight sharing."""
+        with self._lock:
+            keys = {name: self._model_key(name)[0] for name in self._pipelines}
+            for name, stats in self._stats.items():
+                stats["shares_weights_with"] = sorted(
+                    other for other, key in keys.items() if other != name and key == keys.get(name)
+                )
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def default_registry(memory_budget_mb=4096):
+    """The tasks used by hf_pipeline_example.py and transformers_intro.py, registered but not loaded."""
+    registry = PipelineRegistry(memory_budget_mb=memory_budget_mb)
+    registry.register("sentiment-analysis")
+    registry.register("ner", aggregation_strategy="simple")
+    registry.register("summarization")
+    registry.register("translation_en_to_fr")
+    registry.register("question-answering")
+    registry.register("text-generation", model="gpt2")
+    registry.register("fill-mask")
+    registry.register("zero-shot-classification")
+    return registry
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    registry = default_registry(memory_budget_mb=1500)
+    print(f"Registry ready in {time.perf_counter() - start:.3f}s (nothing loaded yet)")
+
+    sentiment = registry.lazy("sentiment-analysis")
+    print(sentiment(["I love using Hugging Face pipelines, they are so easy!"]))
+
+    # a second name on the same checkpoint shares tokenizer and weights with "sentiment-analysis"
+    registry.register("sentiment-copy", task="sentiment-analysis")
+    print(registry.get("sentiment-copy")("The movie was okay, not great, not bad."))
+
+    unmasker = registry.lazy("fill-mask")
+    print(unmasker("The capital of France is the [MASK] city of Paris.".replace("[MASK]", "<mask>"), top_k=1))
+
+    print(f"\nResident: {registry.resident_bytes() / 1024 ** 2:.0f} MB")
+    for name, stats in registry.stats().items():
+        print(f"  {name:<25} loaded={stats['loaded']!s:<5} load={stats['load_seconds']:.1f}s "
+              f"mem={stats['resident_mb']:.0f}MB calls={stats['calls']} shares={stats['shares_weights_with']}")
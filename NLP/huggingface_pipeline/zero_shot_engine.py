@@ -0,0 +1,165 @@
+'''Zero-Shot Classification at Scale: Cached Hypotheses and Batched NLI Pairs
+classifier_zero_shot(text, candidate_labels) in hf_pipeline_example.py turns every (text, label) combination into an NLI pair and
+re-tokenizes the hypothesis "This example is {label}." for every single text. With a fixed set of 40 labels and millions of tickets
+that is 40 hypothesis tokenizations and 40 small model calls per ticket.
+ZeroShotEngine tokenizes the hypotheses ONCE, tokenizes each text once, assembles the NLI pairs from token ids,
+and packs pairs from many texts into large, length-sorted batches. An optional embedding prefilter sends only the top-k most similar labels to the NLI model.'''
+'''Key Concepts:
+NLI pair: premise = the text, hypothesis = the template filled with a label. The entailment logit says how well the label fits.
+Single-label scoring: softmax of the entailment logits over all labels of a text (same as the HF pipeline).
+Multi-label scoring: per label, softmax over [contradiction, entailment].
+Pair assembly: tokenizer.build_inputs_with_special_tokens(premise_ids, hypothesis_ids) gives the same ids as tokenizing the pair as text.
+Prefilter: cosine similarity between text and label embeddings (cheap bi-encoder) picks top-k candidates; the rest get score 0.'''
+import time
+
+import numpy as np
+import torch
+
+
+class ZeroShotEngine:
+    def __init__(self, model, tokenizer, labels, hypothesis_template="This example is {}.", multi_label=False,
+                 pair_batch_size=128, max_length=256, embed=None, prefilter_top_k=None, device=None):
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model = model.to(self.device).eval()
+        self.tokenizer = tokenizer
+        self.labels = list(labels)
+        self.multi_label = multi_label
+        self.pair_batch_size = pair_batch_size
+        self.max_length = max_length
+
+        label2id = {k.lower(): v for k, v in model.config.label2id.items()}
+        self.entail_id = next(v for k, v in label2id.items() if k.startswith("entail"))
+        self.contra_id = next(v for k, v in label2id.items() if k.startswith("contra"))
+
+        # hypotheses are tokenized once for the lifetime of the engine
+        hypotheses = [hypothesis_template.format(label) for label in self.labels]
+        self.hypothesis_ids = tokenizer(hypotheses, add_special_tokens=False)["input_ids"]
+        n_special = tokenizer.num_special_tokens_to_add(pair=True)
+        self.max_premise_len = max_length - n_special - max(len(h) for h in self.hypothesis_ids)
+        self.uses_token_types = "token_type_ids" in tokenizer.model_input_names
+
+        # optional bi-encoder prefilter: embed(list of str) -> (n, dim) array
+        self.embed = embed
+        self.prefilter_top_k = prefilter_top_k if embed is not None else None
+        if self.prefilter_top_k:
+            label_vecs = np.asarray(embed(self.labels), dtype=np.float32)
+            self.label_vecs = label_vecs / np.linalg.norm(label_vecs, axis=1, keepdims=True)
+
+    def _candidates(self, texts):
+        """Label indices to score for every text (all labels, or top-k by embedding similarity)."""
+        if not self.prefilter_top_k or self.prefilter_top_k >= len(self.labels):
+            return np.tile(np.arange(len(self.labels)), (len(texts), 1))
+        vecs = np.asarray(self.embed(texts), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        sims = vecs @ self.label_vecs.T
+        return np.argpartition(-sims, self.prefilter_top_k - 1, axis=1)[:, :self.prefilter_top_k]
+
+    def _pair_logits(self, pairs):
+        """pairs: list of (premise ids, label index). Returns (n_pairs, n_nli_classes) logits in input order."""
+        inputs = [self.tokenizer.build_inputs_with_special_tokens(premise, self.hypothesis_ids[label])
+                  for premise, label in pairs]
+        token_types = [self.tokenizer.create_token_type_ids_from_sequences(premise, self.hypothesis_ids[label])
+                       for premise, label in pairs] if self.uses_token_types else None
+        order = np.argsort([len(ids) for ids in inputs], kind="stable")  # similar lengths -> little padding
+        logits = np.empty((len(pairs), self.model.config.num_labels), dtype=np.float32)
+
+        for start in range(0, len(order), self.pair_batch_size):
+            rows = order[start:start + self.pair_batch_size]
+            seq = max(len(inputs[r]) for r in rows)
+            input_ids = torch.full((len(rows), seq), self.tokenizer.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(rows), seq), dtype=torch.long)
+            token_type_ids = torch.zeros((len(rows), seq), dtype=torch.long) if token_types else None
+            for i, r in enumerate(rows):
+                n = len(inputs[r])
+                input_ids[i, :n] = torch.tensor(inputs[r])
+                attention_mask[i, :n] = 1
+                if token_types:
+                    token_type_ids[i, :n] = torch.tensor(token_types[r])
+            batch = {"input_ids": input_ids.to(self.device), "attention_mask": attention_mask.to(self.device)}
+            if token_types:
+                batch["token_type_ids"] = token_type_ids.to(self.device)
+            with torch.inference_mode():
+                logits[rows] = self.model(**batch).logits.float().cpu().numpy()
+        return logits
+
+    def classify(self, texts):
+        """Same output format as the zero-shot pipeline: [{'sequence', 'labels', 'scores'}], labels sorted by score."""
+        texts = list(texts)
+        if not texts:  # nothing to score (the reshape/argsort below need at least one row)
+            return []
+        premises = self.tokenizer(texts, add_special_tokens=False, truncation=True,
+                                  max_length=self.max_premise_len)["input_ids"]
+        candidates = self._candidates(texts)
+        pairs = [(premises[t], int(label)) for t in range(len(texts)) for label in candidates[t]]
+        logits = self._pair_logits(pairs).reshape(len(texts), candidates.shape[1], -1)
+
+        if self.multi_label:
+            two_way = logits[..., [self.contra_id, self.entail_id]]
+            two_way = np.exp(two_way - two_way.max(axis=-1, keepdims=True))
+            candidate_scores = two_way[..., 1] / two_way.sum(axis=-1)
+        else:
+            entail = logits[..., self.entail_id]
+            entail = np.exp(entail - entail.max(axis=1, keepdims=True))
+            candidate_scores = entail / entail.sum(axis=1, keepdims=True)
+
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)  # prefiltered-out labels score 0
+        np.put_along_axis(scores, candidates, candidate_scores, axis=1)
+        ranking = np.argsort(-scores, axis=1, kind="stable")
+        return [
+            {"sequence": text, "labels": [self.labels[i] for i in order], "scores": scores[t, order].tolist()}
+            for t, (text, order) in enumerate(zip(texts, ranking))
+        ]
+
+    def classify_stream(self, texts, chunk_size=256):
+        """Classify an iterable of texts in chunks of chunk_size (many texts per model batch)."""
+        chunk = []
+        for text in texts:
+            chunk.append(text)
+            if len(chunk) == chunk_size:
+                yield from self.classify(chunk)
+                chunk = []
+        if chunk:
+            yield from self.classify(chunk)
+
+
+def texts_per_second(classify, texts):
+    start = time.perf_counter()
+    classify(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    checkpoint = "facebook/bart-large-mnli"  # default model of the zero-shot pipeline
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    model = AutoModelForSequenceClassification.from_pretrained(checkpoint)
+
+    labels = ["billing", "refund", "login problem", "bug report", "feature request", "shipping", "cancellation",
+              "account deletion", "password reset", "praise"]
+    tickets = [
+        "I was charged twice for my subscription this month.",
+        "The app crashes every time I open the settings page.",
+        "Can you add a dark mode please?",
+        "My package still has not arrived after two weeks.",
+    ] * 8
+
+    engine = ZeroShotEngine(model, tokenizer, labels)
+    for result in engine.classify(tickets[:4]):
+        print(f"  '{result['sequence']}' -> {result['labels'][0]} ({result['scores'][0]:.2f})")
+
+    classifier_zero_shot = pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+    baseline = texts_per_second(lambda ts: [classifier_zero_shot(t, labels) for t in ts], tickets)
+    cached = texts_per_second(engine.classify, tickets)
+    print(f"\nFixed set of {len(labels)} labels:")
+    print(f"  pipeline, one text at a time: {baseline:.1f} texts/s")
+    print(f"  ZeroShotEngine:               {cached:.1f} texts/s")
+
+    # with a cheap bi-encoder prefilter only the top-3 labels go through the NLI model
+    try:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        prefiltered = ZeroShotEngine(model, tokenizer, labels, embed=encoder.encode, prefilter_top_k=3)
+        print(f"  ZeroShotEngine + top-3 prefilter: {texts_per_second(prefiltered.classify, tickets):.1f} texts/s")
+    except ImportError:
+        print("  (install sentence-transformers to try the embedding prefilter)")
@@ -0,0 +1,217 @@
+'''On-Disk Embedding Cache for SentenceTransformer Encodes
+fact_checker_bot.py calls model.encode(old_facts) on every run, although the knowledge base hardly changes between runs.
+EmbeddingCache keeps every embedding it has ever computed in a memory-mapped float16 matrix on disk, keyed by a hash of
+(model name, normalized text). A run only encodes the sentences that are new or changed (in one batched encode call);
+everything else is read straight from the file. When the requested texts are one contiguous run of rows (always the case on a
+warm start), a slice of the memmap is returned, without a copy.'''
+'''Key Concepts:
+Content hash: blake2b(model name + normalized text). Changing the model or the text gives a new key, so stale vectors are never reused.
+Normalization: Unicode NFKC + collapsed whitespace, so "Free  shipping " and "Free shipping" share one embedding.
+float16 matrix (vectors-<generation>.f16): row i holds the embedding of the i-th cached text; byte offset of row i = i * dim * 2. Half the size of float32.
+Offset index: sorted keys + their row numbers (sorted_keys / sorted_rows). Lookup of many texts = one np.searchsorted call.
+Append-only + commit file: new rows are appended, new index files are written, and meta.json is replaced last (atomically),
+  so a crash mid-update leaves the previous cache fully usable.
+Reordering: after an edit the changed texts live in new rows at the end, so the corpus is no longer one contiguous run of rows.
+  When a request covers (nearly) the whole cache (>= reorder_fraction of the rows), the matrix is rewritten once in the order
+  of the request (a new generation of files, same commit protocol), and every later warm start is zero-copy again.
+  Small lookups never trigger a rewrite (they get a gathered copy); compact(texts) reorders explicitly.'''
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def text_keys(texts, model_name):
+    """16-byte content hashes, one per text, as a NumPy 'S16' array (sortable, searchable)."""
+    prefix = f"{model_name}\x1f".encode()
+    digests = [hashlib.blake2b(prefix + normalize_text(t).encode(), digest_size=16).digest() for t in texts]
+    return np.array(digests, dtype="S16")
+
+
+class EmbeddingCache:
+    """encode: callable list of str -> (n, dim) array, e.g. lambda batch: model.encode(batch, batch_size=128)."""
+
+    def __init__(self, cache_dir, model_name, encode, reorder_fraction=0.9):
+        self.model_name = model_name
+        self.encode_fn = encode
+        self.reorder_fraction = reorder_fraction  # None: only compact() / encode(reorder=True) rewrite the matrix
+        self.path = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = self.misses = 0
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            meta = {"model_name": self.model_name, "dim": None, "n_rows": 0, "generation": 0,
+                    "vectors_file": "vectors-0.f16"}
+        self.dim, self.n_rows = meta["dim"], meta["n_rows"]
+        self.generation, self.vectors_file = meta["generation"], meta["vectors_file"]
+        if self.n_rows:
+            self.sorted_keys = np.load(self._file(f"sorted_keys-{self.generation}.npy"), mmap_mode="r")
+            self.sorted_rows = np.load(self._file(f"sorted_rows-{self.generation}.npy"), mmap_mode="r")
+            # rows past n_rows (an interrupted append) are simply not mapped
+            self.matrix = np.memmap(self._file(self.vectors_file), dtype=np.float16, mode="r",
+                                    shape=(self.n_rows, self.dim))
+        else:
+            self.sorted_keys = np.zeros(0, dtype="S16")
+            self.sorted_rows = np.zeros(0, dtype=np.int64)
+            self.matrix = np.zeros((0, self.dim or 0), dtype=np.float16)
+
+    def __len__(self):
+        return self.n_rows
+
+    def lookup(self, keys):
+        """Row number of every key in the matrix, -1 where the key is not cached."""
+        if not self.n_rows:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.sorted_keys, keys), self.n_rows - 1)
+        return np.where(self.sorted_keys[pos] == keys, self.sorted_rows[pos], -1)
+
+    def _append(self, new_keys, vectors):
+        """new_keys: unique and not yet cached; vectors: their embeddings in the same order (= new row order)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float16)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"embedding dim {vectors.shape[1]} does not match the cache ({self.dim})")
+        vec_path = self._file(self.vectors_file)
+        with open(vec_path, "r+b" if os.path.exists(vec_path) else "wb") as f:
+            f.truncate(self.n_rows * self.dim * 2)  # drop a half-written tail from an interrupted run
+            f.seek(0, os.SEEK_END)
+            f.write(vectors.tobytes())
+
+        # merge the new keys into the sorted index (one O(n) insert, no re-sort)
+        n_rows = self.n_rows + len(new_keys)
+        order = np.argsort(new_keys)
+        pos = np.searchsorted(self.sorted_keys, new_keys[order])
+        sorted_keys = np.insert(np.asarray(self.sorted_keys), pos, new_keys[order])
+        sorted_rows = np.insert(np.asarray(self.sorted_rows), pos, np.arange(self.n_rows, n_rows)[order])
+        self._commit(sorted_keys, sorted_rows, n_rows, self.vectors_file)
+
+    def _commit(self, sorted_keys, sorted_rows, n_rows, vectors_file):
+        generation = self.generation + 1
+        np.save(self._file(f"sorted_keys-{generation}.npy"), sorted_keys)
+        np.save(self._file(f"sorted_rows-{generation}.npy"), sorted_rows)
+
+        # commit point: meta.json names the generation of the index files, the vectors file and the number of valid rows
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "n_rows": n_rows, "generation": generation,
+                       "vectors_file": vectors_file}, f)
+        os.replace(tmp, self._file("meta.json"))
+        old = [f"sorted_keys-{self.generation}.npy", f"sorted_rows-{self.generation}.npy"]
+        if vectors_file != self.vectors_file:
+            old.append(self.vectors_file)
+        self._load()
+        for name in old:
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+
+    def _reorder(self, first_rows):
+        """Rewrite the matrix so that first_rows (unique row numbers) become rows 0..len-1, the other rows follow."""
+        rest = np.ones(self.n_rows, dtype=bool)
+        rest[first_rows] = False
+        order = np.concatenate([first_rows, np.flatnonzero(rest)])  # new row i = old row order[i]
+        new_row = np.empty(self.n_rows, dtype=np.int64)
+        new_row[order] = np.arange(self.n_rows)
+        vectors_file = f"vectors-{self.generation + 1}.f16"
+        with open(self._file(vectors_file), "wb") as f:
+            for start in range(0, self.n_rows, 65536):  # bounded memory, whatever the cache size
+                f.write(np.ascontiguousarray(self.matrix[order[start:start + 65536]]).tobytes())
+        self._commit(self.sorted_keys, new_row[self.sorted_rows], self.n_rows, vectors_file)
+
+    def encode(self, texts, reorder=False):
+        """(len(texts), dim) float16 embeddings. Only uncached texts are encoded, deduplicated, in one call.
+        If the texts occupy one contiguous run of rows (a warm start), a slice of the memmap is returned (no copy).
+        Otherwise the rows are gathered into a copy; only a request covering >= reorder_fraction of the cache
+        (e.g. the full corpus after an edit), or reorder=True, rewrites the matrix so that it is contiguous from then on."""
+        texts = list(texts)
+        keys = text_keys(texts, self.model_name)
+        rows = self.lookup(keys)
+        missing = np.flatnonzero(rows < 0)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if len(missing):
+            # first occurrence of every new key, kept in input order so a full corpus is stored in its own order
+            first = missing[np.sort(np.unique(keys[missing], return_index=True)[1])]
+            self._append(keys[first], self.encode_fn([texts[i] for i in first]))
+            rows = self.lookup(keys)
+        if len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            return self.matrix[rows[0]:rows[0] + len(rows)]  # zero copy
+        covers_cache = self.reorder_fraction is not None and len(rows) >= self.reorder_fraction * self.n_rows
+        if (reorder or covers_cache) and len(rows) and len(np.unique(rows)) == len(rows):
+            self._reorder(rows)
+            return self.matrix[:len(rows)]
+        return self.matrix[rows]
+
+    def compact(self, texts):
+        """Rewrite the matrix so that the cached texts among `texts` (in this order) come first, as one contiguous run."""
+        rows = self.lookup(text_keys(list(texts), self.model_name))
+        rows = rows[rows >= 0]
+        rows = rows[np.sort(np.unique(rows, return_index=True)[1])]  # first occurrence of each row, request order
+        if len(rows) and not np.array_equal(rows, np.arange(len(rows))):
+            self._reorder(rows)
+        return self
+
+
+if __name__ == "__main__":
+    import shutil
+
+    from sentence_transformers import SentenceTransformer
+
+    model_name = "all-MiniLM-L6-v2"
+    model = SentenceTransformer(model_name)
+    old_facts = [
+        "Our return policy allows returns within 30 days.",
+        "Free shipping is offered on orders above $50.",
+        "Customer support is available from 9am to 5pm.",
+        "Warranty covers devices for one year only.",
+        "Gift cards cannot be redeemed for cash."
+    ]
+    knowledge_base = old_facts + [f"Policy clause {i}: items of category {i % 40} follow rule {i % 7}." for i in range(5000)]
+    shutil.rmtree("embedding_cache", ignore_errors=True)
+
+    def run(texts):
+        cache = EmbeddingCache("embedding_cache", model_name, lambda batch: model.encode(batch, batch_size=128))
+        start = time.perf_counter()
+        vecs = cache.encode(texts)
+        return vecs, cache, time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.encode(knowledge_base, batch_size=128)
+    print(f"model.encode every run:  {time.perf_counter() - start:.2f}s")
+
+    vecs, cache, seconds = run(knowledge_base)
+    print(f"cold cache:              {seconds:.2f}s ({cache.misses} encoded)")
+    vecs, cache, seconds = run(knowledge_base)
+    print(f"warm cache:              {seconds:.4f}s ({cache.misses} encoded, memmap returned: {isinstance(vecs, np.memmap)})")
+
+    # one fact changed, one added: only those two sentences are encoded
+    edited = knowledge_base.copy()
+    edited[0] = "Our return policy allows returns within 60 days."
+    edited.append("Gift wrapping is free during December.")
+    vecs, cache, seconds = run(edited)
+    print(f"after an edit:           {seconds:.4f}s ({cache.misses} encoded, {cache.hits} from cache)")
+    vecs, cache, seconds = run(edited)
+    print(f"warm cache after edit:   {seconds:.4f}s (memmap returned: {isinstance(vecs, np.memmap)})")
+    generation = cache.generation
+    vecs, cache, seconds = run([edited[5], edited[4000]])  # a small, scattered lookup: gathered copy, no rewrite
+    assert cache.generation == generation and len(vecs) == 2
+    print(f"cache: {len(cache)} rows, {cache.matrix.nbytes / 1e6:.1f} MB on disk (float16)")
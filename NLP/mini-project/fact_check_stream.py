@@ -0,0 +1,243 @@
+'''Streaming Fact Checker: Micro-Batched Matching over a Continuous Update Feed
+fact_checker_bot.py checks a fixed list of new_updates one at a time: one cosine_similarity call, one argmax and a few prints per update.
+FactCheckStream consumes a continuous feed instead (a JSONL file that keeps growing, or a local TCP socket), collects updates
+into micro-batches, encodes each batch with ONE encode call, matches it against the whole knowledge base with ONE matrix multiply
++ top-k, and writes the alerts as structured JSONL, so other tools can pick them up.'''
+'''Key Concepts:
+Micro-batch: flushed when max_batch_size updates are waiting OR max_wait_ms after the first one arrived (same idea as microbatch_server.py).
+Batched matching: scores = update_vecs @ fact_vecs.T, then top-k per row (vector_index.exact_search), or an IVFPQIndex for huge knowledge bases.
+Backpressure: updates go through a bounded queue. When matching falls behind, readers wait on the full queue:
+  the file is simply read more slowly, and a socket sender is slowed down by TCP flow control. Memory stays bounded.
+Malformed lines (not UTF-8, JSON object without "text") are logged and skipped (stats["skipped"]); they never end the stream.
+Alert format (one JSON object per line): {"update_id", "update", "matches": [{"fact_id", "fact", "score"}], "time"}.'''
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from vector_index import exact_search
+
+logger = logging.getLogger(__name__)
+
+
+def parse_update(line, default_id):
+    """A feed line is either JSON ({"text": ..., "id": ...} or a JSON string) or plain text.
+    Returns None for a malformed line (not UTF-8, or a JSON object without a "text" string)."""
+    try:
+        line = line.decode("utf-8").strip() if isinstance(line, bytes) else line.strip()
+    except UnicodeDecodeError:
+        return None
+    try:
+        obj = json.loads(line)
+    except json.JSONDecodeError:
+        obj = line
+    if isinstance(obj, dict):
+        if not isinstance(obj.get("text"), str):
+            return None
+        return {"id": obj.get("id", default_id), "text": obj["text"]}
+    return {"id": default_id, "text": str(obj)}
+
+
+class FactCheckStream:
+    """encode: callable list of str -> (n, dim) array. fact_vectors: (n_facts, dim) L2-normalized embeddings of facts
+    (e.g. EmbeddingCache.encode(facts)). index: optional IVFPQIndex over the same facts, used instead of the exact scan."""
+
+    def __init__(self, encode, facts, fact_vectors, threshold=0.8, top_k=3, max_batch_size=64, max_wait_ms=50.0,
+                 max_queue=1024, index=None, nprobe=16):
+        self.encode = encode
+        self.facts = facts
+        self.fact_vectors = fact_vectors
+        self.threshold = threshold
+        self.top_k = top_k
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.index = index
+        self.nprobe = nprobe
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matcher")
+        self.queue = None
+        self.stats = {"updates": 0, "alerts": 0, "batches": 0, "skipped": 0, "seconds": 0.0}
+
+    # --- matching (runs on the worker thread) ---
+    def check_batch(self, updates):
+        vecs = np.asarray(self.encode([u["text"] for u in updates]), dtype=np.float32)  # one encode call per batch
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)  # normalized: inner product = cosine similarity
+        if self.index is not None:
+            scores, ids = self.index.search(vecs, self.top_k, self.nprobe, refine_vectors=self.fact_vectors)
+        else:
+            scores, ids = exact_search(self.fact_vectors, vecs, self.top_k)
+        alerts = []
+        for update, row_scores, row_ids in zip(updates, scores, ids):
+            matches = [{"fact_id": int(i), "fact": self.facts[i], "score": round(float(s), 4)}
+                       for s, i in zip(row_scores, row_ids) if i >= 0 and s > self.threshold]
+            if matches:
+                alerts.append({"update_id": update["id"], "update": update["text"], "matches": matches,
+                               "time": time.time()})
+        return alerts
+
+    # --- producers ---
+    async def put(self, update):
+        await self.queue.put(update)  # waits while the queue is full (backpressure)
+
+    async def put_line(self, line, default_id):
+        """Parse and queue one raw feed line; a malformed line is logged and skipped, the stream goes on."""
+        update = parse_update(line, default_id)
+        if update is None:
+            self.stats["skipped"] += 1
+            logger.warning("skipping malformed update %s: %.200r", default_id, line)
+            return
+        await self.put(update)
+
+    async def read_jsonl(self, path, follow=False, poll_interval=0.5):
+        """Feed the lines of a JSONL file. follow=True keeps waiting for new lines (like tail -f)."""
+        with open(path, "rb") as f:
+            n = 0
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if follow and not line.endswith(b"\n"):  # EOF, or a line that is still being written
+                    f.seek(pos)
+                    await asyncio.sleep(poll_interval)
+                    continue
+                if not line:
+                    return
+                if line.strip():
+                    await self.put_line(line, n)
+                    n += 1
+
+    async def _handle_connection(self, reader, writer):
+        n = 0
+        peer = writer.get_extra_info("peername")
+        async for line in reader:  # not reading while the queue is full -> TCP slows the sender down
+            if line.strip():
+                await self.put_line(line, f"{peer[0]}:{peer[1]}:{n}")
+                n += 1
+        writer.close()
+
+    # --- consumer ---
+    async def _consume(self, out):
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    update = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if update is None:  # end of feed: flush what we have, then stop
+                    finished = True
+                    break
+                batch.append(update)
+
+            alerts = await loop.run_in_executor(self.executor, self.check_batch, batch)
+            out.write("".join(json.dumps(alert) + "\n" for alert in alerts))
+            out.flush()
+            self.stats["updates"] += len(batch)
+            self.stats["alerts"] += len(alerts)
+            self.stats["batches"] += 1
+
+    async def run(self, produce, alerts_path):
+        """Run producer coroutine `produce` (e.g. self.read_jsonl(path)) until it ends, matching as updates arrive."""
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        start = time.perf_counter()
+        with open(alerts_path, "a", encoding="utf-8") as out:
+            consumer = asyncio.create_task(self._consume(out))
+            producer = asyncio.ensure_future(produce)
+            try:
+                # the consumer only ends before the producer if it died: then nobody drains the queue
+                await asyncio.wait({producer, consumer}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not producer.done():  # consumer died, or run() was cancelled: stop reading the feed
+                    producer.cancel()
+                    await asyncio.wait({producer})
+                if not consumer.done():
+                    # end-of-feed marker; stop waiting for room in the queue if the consumer dies meanwhile
+                    end = asyncio.ensure_future(self.queue.put(None))
+                    await asyncio.wait({end, consumer}, return_when=asyncio.FIRST_COMPLETED)
+                    end.cancel()
+                    await asyncio.wait({consumer})
+                self.stats["seconds"] += time.perf_counter() - start
+        consumer.result()  # re-raises the consumer's error, if any
+        producer.result()
+        return self.stats
+
+    async def serve(self, alerts_path, host="127.0.0.1", port=8765):
+        """Accept newline-delimited updates on a local TCP socket until cancelled (e.g. Ctrl+C)."""
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Listening for updates on {host}:{port} (one JSON object or line of text per update)")
+        async with server:
+            await self.run(server.serve_forever(), alerts_path)
+
+    def updates_per_second(self):
+        return self.stats["updates"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+
+if __name__ == "__main__":
+    import sys
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    old_facts = [
+        "Our return policy allows returns within 30 days.",
+        "Free shipping is offered on orders above $50.",
+        "Customer support is available from 9am to 5pm.",
+        "Warranty covers devices for one year only.",
+        "Gift cards cannot be redeemed for cash."
+    ]
+    new_updates = [
+        "The return policy now gives you 60 days to return items.",
+        "Support hours are extended to 8pm.",
+        "Free shipping now requires a minimum order of $100.",
+        "We now offer two-year warranty coverage."
+    ]
+    encode = lambda texts: model.encode(texts, batch_size=64)
+    stream = FactCheckStream(encode, old_facts, model.encode(old_facts, normalize_embeddings=True), threshold=0.6)
+
+    if "--serve" in sys.argv:
+        # e.g.: echo '{"text": "Support hours are extended to 8pm."}' | nc 127.0.0.1 8765
+        asyncio.run(stream.serve("alerts.jsonl"))
+        sys.exit()
+
+    # a feed of 2,000 announcements in a JSONL file
+    with open("updates.jsonl", "w", encoding="utf-8") as f:
+        for i in range(2000):
+            f.write(json.dumps({"id": i, "text": new_updates[i % len(new_updates)]}) + "\n")
+
+    # baseline: the fact_checker_bot.py loop, one update at a time
+    fact_vecs = model.encode(old_facts, convert_to_tensor=True)
+    start = time.perf_counter()
+    for text in new_updates * 50:
+        scores = torch.nn.functional.cosine_similarity(model.encode([text], convert_to_tensor=True), fact_vecs).cpu().numpy()
+        best_idx = np.argmax(scores)
+    print(f"One update at a time: {200 / (time.perf_counter() - start):.0f} updates/s")
+
+    stats = asyncio.run(stream.run(stream.read_jsonl("updates.jsonl"), "alerts.jsonl"))
+    print(f"Streaming micro-batches: {stream.updates_per_second():.0f} updates/s "
+          f"({stats['updates']} updates, {stats['batches']} batches, {stats['alerts']} alerts)")
+    with open("alerts.jsonl", encoding="utf-8") as f:
+        print("First alert:", f.readline().strip())
+
+    # a failing encoder must end run() with its error, not leave the reader blocked on the full queue
+    def broken_encode(texts):
+        raise RuntimeError("encoder failed")
+
+    broken = FactCheckStream(broken_encode, old_facts, stream.fact_vectors, max_queue=4)
+    try:
+        asyncio.run(asyncio.wait_for(broken.run(broken.read_jsonl("updates.jsonl"), "alerts.jsonl"), timeout=20))
+    except RuntimeError as exc:
+        print(f"Failing encoder: run() stopped with {exc!r}")
+    else:
+        raise AssertionError("run() should re-raise the consumer's error")
@@ -31,13 +31,17 @@ new_updates = [
 ]
 
 # --- 4. Get Sentence Embeddings (meaning vectors)
+# (old_facts are re-encoded on every run; embedding_cache.py stores them on disk and only encodes new or changed sentences)
 old_vecs = model.encode(old_facts, convert_to_tensor=True)
 new_vecs = model.encode(new_updates, convert_to_tensor=True)
 
 # --- 5. Fact Checker Logic: Find Old Facts Most Similar to Each New Update
 # (use cosine similarity to measure meaning closeness)
+# (this scans every old fact per update; for a large knowledge base see vector_index.py, an IVF-PQ index with top-k search)
 threshold = 0.8  # similarity threshold: 1.0 is identical; try 0.8 for a good match
 
+# For a continuous feed of updates (JSONL file or socket) see fact_check_stream.py: micro-batched encode + one matmul per batch
+
 for i, new_fact in enumerate(new_updates):
     scores = torch.nn.functional.cosine_similarity(
         new_vecs[i].unsqueeze(0), old_vecs
@@ -0,0 +1,329 @@
+'''Approximate Nearest Neighbour Index (IVF-PQ) for the Fact Checker Knowledge Base
+fact_checker_bot.py compares every new update with EVERY old fact (cosine_similarity over old_vecs) and then takes the argmax.
+With ~2M policy sentences that is 2M dot products of 384 floats per update, plus 3 GB of float32 vectors in memory.
+IVFPQIndex clusters the knowledge base into lists and compresses every vector to a few bytes, so a query only scans
+the handful of lists closest to it, using table lookups instead of float math. Written in pure NumPy, saved to disk as .npy files.'''
+'''Key Concepts:
+IVF (inverted file): k-means splits the vectors into n_lists clusters. A query only visits the nprobe clusters whose centroid is closest.
+PQ (product quantization): the residual (vector - its centroid) is cut into m sub-vectors; each sub-vector is replaced by the id (1 byte)
+  of its nearest codeword. 384 float32 values (1536 bytes) become m bytes.
+ADC (asymmetric distance computation): per query, a small table q_sub . codeword is computed once (m x 256);
+  the score of a stored vector is then the centroid score plus m table lookups.
+Inner product: the sentence embeddings are L2-normalized, so inner product = cosine similarity.
+Incremental updates: add() encodes new vectors into their lists, delete() removes ids; no retraining needed as long as the topic mix is stable.
+Re-ranking: optionally the top candidates are re-scored with the exact vectors, which recovers most of the recall lost to compression.'''
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+def nearest_centroid(x, centroids, chunk_size=65536):
+    """Index of the nearest centroid (L2) for every row of x, in chunks to bound memory."""
+    half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+    assign = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk_size):
+        # argmin ||x - c||^2 == argmax (x . c - ||c||^2 / 2)
+        scores = x[start:start + chunk_size] @ centroids.T - half_norms
+        assign[start:start + chunk_size] = scores.argmax(axis=1)
+    return assign
+
+
+def kmeans(x, n_clusters, n_iter=20, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = nearest_centroid(x, centroids)
+        counts = np.bincount(assign, minlength=n_clusters)
+        order = np.argsort(assign, kind="stable")
+        used = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[used]
+        centroids[used] = np.add.reduceat(x[order], starts, axis=0) / counts[used, None]
+        # an empty cluster restarts at a random point
+        empty = np.flatnonzero(counts == 0)
+        centroids[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+    return centroids
+
+
+def exact_search(base, queries, k=10, chunk_size=65536):
+    """Brute force inner-product top-k (the reference for recall). Returns (scores, row indices), best first."""
+    queries = np.asarray(queries, dtype=np.float32)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(base), chunk_size):
+        scores = queries @ np.asarray(base[start:start + chunk_size], dtype=np.float32).T
+        top = topk_indices(scores, k)
+        # merge the chunk's top-k with the best found so far
+        scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        rows = np.concatenate([best_rows, top + start], axis=1)
+        top = topk_indices(scores, k)
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_rows = np.take_along_axis(rows, top, axis=1)
+    return best_scores, best_rows
+
+
+def topk_indices(scores, k):
+    """Column indices of the k largest values of every row, sorted best first."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+class IVFPQIndex:
+    ARRAYS = ("centroids", "codebooks", "codes", "ids", "list_offsets")
+
+    def __init__(self, dim, n_lists=1024, n_subquantizers=48, n_codewords=256):
+        if dim % n_subquantizers:
+            raise ValueError(f"dim={dim} must be divisible by n_subquantizers={n_subquantizers}")
+        if n_codewords > 256:
+            raise ValueError("codes are stored as uint8, so n_codewords must be <= 256")
+        self.dim = dim
+        self.n_lists = n_lists
+        self.m = n_subquantizers
+        self.dsub = dim // n_subquantizers
+        self.n_codewords = n_codewords
+        self.centroids = None  # (n_lists, dim)
+        self.codebooks = None  # (m, n_codewords, dsub)
+        # one (codes, ids) pair per list; a list is a view into the loaded arrays until it is modified
+        self.list_codes = [np.zeros((0, self.m), dtype=np.uint8) for _ in range(n_lists)]
+        self.list_ids = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+        self.list_of_id = np.full(0, -1, dtype=np.int32)  # id -> list it lives in (-1: not in the index)
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.list_ids)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    # --- training ---
+    def train(self, sample, n_iter=10, seed=0):
+        """Learn the coarse centroids and the PQ codebooks from a sample (e.g. 100k-200k vectors)."""
+        sample = np.asarray(sample, dtype=np.float32)
+        if len(sample) < max(self.n_lists, self.n_codewords):
+            raise ValueError(f"need at least {max(self.n_lists, self.n_codewords)} training vectors, got {len(sample)}")
+        self.centroids = kmeans(sample, self.n_lists, n_iter, seed)
+        residuals = sample - self.centroids[nearest_centroid(sample, self.centroids)]
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.n_codewords, n_iter, seed + j)
+            for j in range(self.m)
+        ])
+        return self
+
+    def _encode(self, residuals):
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_centroid(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return codes
+
+    # --- incremental updates ---
+    def add(self, ids, vectors):
+        """Add (or replace) vectors under integer ids >= 0. Ids that are already indexed are overwritten."""
+        if not self.is_trained:
+            raise RuntimeError("call train() before add()")
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if ids.ndim != 1 or len(ids) != len(vectors):
+            raise ValueError(f"expected one id per vector, got {ids.shape} ids for {len(vectors)} vectors")
+        if ids.size and ids.min() < 0:  # a negative id would index list_of_id from the end
+            raise ValueError(f"ids passed to add() must be >= 0, got {int(ids.min())}")
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("ids passed to add() must be unique")
+        self.delete(ids)
+
+        assign = nearest_centroid(vectors, self.centroids)
+        codes = self._encode(vectors - self.centroids[assign])
+        if ids.size and ids.max() >= len(self.list_of_id):
+            grown = np.full(max(int(ids.max()) + 1, 2 * len(self.list_of_id)), -1, dtype=np.int32)
+            grown[:len(self.list_of_id)] = self.list_of_id
+            self.list_of_id = grown
+        self.list_of_id[ids] = assign
+        # one concatenate per touched list, not one per vector
+        order = np.argsort(assign, kind="stable")
+        touched, starts = np.unique(assign[order], return_index=True)
+        for lst, rows in zip(touched, np.split(order, starts[1:])):
+            self.list_codes[lst] = np.concatenate([self.list_codes[lst], codes[rows]])
+            self.list_ids[lst] = np.concatenate([self.list_ids[lst], ids[rows]])
+
+    def delete(self, ids):
+        """Remove ids from the index (unknown ids are ignored). Only the lists that hold them are touched."""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.list_of_id))]
+        lists = self.list_of_id[ids]
+        ids, lists = ids[lists >= 0], lists[lists >= 0]
+        for lst in np.unique(lists):
+            keep = ~np.isin(self.list_ids[lst], ids[lists == lst])
+            self.list_codes[lst] = self.list_codes[lst][keep]
+            self.list_ids[lst] = self.list_ids[lst][keep]
+        self.list_of_id[ids] = -1
+
+    # --- search ---
+    def search(self, queries, k=10, nprobe=16, refine_vectors=None, refine_factor=4):
+        """Top-k (scores, ids) per query, best first; missing results have id -1.
+        refine_vectors: optional array indexed by id (e.g. a memory-mapped embedding matrix) used to re-score
+        the best k * refine_factor candidates exactly."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(nprobe, self.n_lists)
+        n_candidates = k * refine_factor if refine_vectors is not None else k
+        coarse = queries @ self.centroids.T
+        probes = topk_indices(coarse, nprobe)
+        # ADC tables for all queries at once: luts[q, j, c] = q_sub_j . codebook[j, c]
+        luts = np.einsum("qjd,jcd->qjc", queries.reshape(len(queries), self.m, self.dsub), self.codebooks)
+        lut_offsets = np.arange(self.m) * self.n_codewords
+
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for q in range(len(queries)):
+            lists = probes[q]
+            codes = np.concatenate([self.list_codes[lst] for lst in lists])
+            if not len(codes):
+                continue
+            ids = np.concatenate([self.list_ids[lst] for lst in lists])
+            list_scores = np.repeat(coarse[q, lists], [len(self.list_ids[lst]) for lst in lists])
+            scores = list_scores + luts[q].ravel()[codes + lut_offsets].sum(axis=1)
+            top = topk_indices(scores[None, :], n_candidates)[0]
+            scores, ids = scores[top], ids[top]
+            if refine_vectors is not None:
+                scores = np.asarray(refine_vectors[ids], dtype=np.float32) @ queries[q]
+                top = topk_indices(scores[None, :], k)[0]
+                scores, ids = scores[top], ids[top]
+            out_scores[q, :len(ids)] = scores[:k]
+            out_ids[q, :len(ids)] = ids[:k]
+        return out_scores, out_ids
+
+    # --- persistence ---
+    def save(self, path):
+        """Write the index to directory path. Safe to call on the path the index was loaded (memory-mapped) from:
+        everything is written to a temp dir next to it first and then swapped in, so the mapped files are never truncated."""
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}.tmp-")
+        try:
+            self.codes = np.concatenate(self.list_codes)
+            self.ids = np.concatenate(self.list_ids)
+            self.list_offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in self.list_ids])]).astype(np.int64)
+            for name in self.ARRAYS:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+            del self.codes, self.ids, self.list_offsets
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "n_lists": self.n_lists, "n_subquantizers": self.m,
+                           "n_codewords": self.n_codewords}, f)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        # swap directories; the old files stay readable through existing memmaps until they are closed
+        old_dir = None
+        if os.path.exists(path):
+            old_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(path)}.old-")
+            os.rename(path, os.path.join(old_dir, "index"))
+        os.rename(tmp_dir, path)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index. With mmap=True the codes stay on disk and are paged in as lists are probed."""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            index = cls(**json.load(f))
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        index.centroids = np.asarray(arrays["centroids"])
+        index.codebooks = np.asarray(arrays["codebooks"])
+        bounds = arrays["list_offsets"]
+        index.list_codes = [arrays["codes"][bounds[i]:bounds[i + 1]] for i in range(index.n_lists)]
+        index.list_ids = [arrays["ids"][bounds[i]:bounds[i + 1]] for i in range(index.n_lists)]
+        ids = np.asarray(arrays["ids"])
+        index.list_of_id = np.full(int(ids.max()) + 1 if ids.size else 0, -1, dtype=np.int32)
+        index.list_of_id[ids] = np.repeat(np.arange(index.n_lists), np.diff(bounds))
+        return index
+
+
+def recall_latency_benchmark(index, base, queries, k=10, nprobes=(1, 4, 16, 64), refine_factor=None):
+    """Recall@k against exact search and mean latency per query, for several nprobe values.
+    base: the indexed vectors, with id == row number."""
+    start = time.perf_counter()
+    _, truth = exact_search(base, queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    rows = [{"method": "exact", "nprobe": None, "recall": 1.0, "ms_per_query": exact_ms}]
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        _, found = index.search(queries, k, nprobe, refine_vectors=base if refine_factor else None,
+                                refine_factor=refine_factor or 1)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(np.intersect1d(t, f)) / k for t, f in zip(truth, found)])
+        rows.append({"method": "ivfpq" + ("+refine" if refine_factor else ""), "nprobe": nprobe,
+                     "recall": float(recall), "ms_per_query": ms})
+    return rows
+
+
+if __name__ == "__main__":
+    # synthetic stand-in for a large knowledge base: clustered, L2-normalized 384-d "sentence embeddings"
+    rng = np.random.default_rng(0)
+    dim, n_base, n_topics = 384, 200_000, 2000
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    subtopics = topics.repeat(10, axis=0) + 0.5 * rng.standard_normal((n_topics * 10, dim)).astype(np.float32)
+    base = subtopics[rng.integers(len(subtopics), size=n_base)]
+    base += 0.3 * rng.standard_normal((n_base, dim)).astype(np.float32)
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+    queries = base[rng.choice(n_base, 200, replace=False)] + 0.05 * rng.standard_normal((200, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    index = IVFPQIndex(dim, n_lists=512, n_subquantizers=48).train(base[rng.choice(n_base, 20_000, replace=False)])
+    index.add(np.arange(n_base), base)
+    print(f"Trained and indexed {len(index)} vectors in {time.perf_counter() - start:.1f}s "
+          f"({index.m} bytes/vector instead of {dim * 4})")
+
+    for refine in (None, 4):
+        for row in recall_latency_benchmark(index, base, queries, k=10, refine_factor=refine):
+            if row["method"] == "exact" and refine:
+                continue
+            print(f"  {row['method']:<13} nprobe={str(row['nprobe']):>4}  recall@10={row['recall']:.3f}  "
+                  f"{row['ms_per_query']:.2f} ms/query")
+
+    # a document changed: drop its old sentences, add the new ones; no retraining
+    index.delete(np.arange(10))
+    index.add(np.arange(10), queries[:10])
+    print(f"\nAfter update: top hit for query 0 is id {index.search(queries[:1], k=1)[1][0, 0]}")
+
+    index.save("fact_index")
+    reloaded = IVFPQIndex.load("fact_index")
+    print(f"Reloaded index with {len(reloaded)} vectors")
+
+    # persist-after-add: load (memory-mapped) -> add -> save to the same path -> load
+    reloaded.add([n_base], queries[10:11])
+    reloaded.save("fact_index")
+    reloaded = IVFPQIndex.load("fact_index")
+    assert len(reloaded) == n_base + 1 and n_base in reloaded.search(queries[10:11], k=10, nprobe=16)[1][0]
+    print(f"Added one vector and saved over the mapped index: {len(reloaded)} vectors")
+
+    # the fact checker with the index instead of the full cosine_similarity scan
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    old_facts = [
+        "Our return policy allows returns within 30 days.",
+        "Free shipping is offered on orders above $50.",
+        "Customer support is available from 9am to 5pm.",
+        "Warranty covers devices for one year only.",
+        "Gift cards cannot be redeemed for cash."
+    ]
+    new_updates = ["The return policy now gives you 60 days to return items.", "Support hours are extended to 8pm."]
+    old_vecs = model.encode(old_facts, normalize_embeddings=True)
+    # tiny demo knowledge base: a handful of lists and sub-quantizers, trained on the facts repeated with noise
+    train = np.repeat(old_vecs, 60, axis=0) + 0.05 * rng.standard_normal((300, old_vecs.shape[1])).astype(np.float32)
+    kb_index = IVFPQIndex(old_vecs.shape[1], n_lists=4, n_subquantizers=16, n_codewords=64).train(train)
+    kb_index.add(np.arange(len(old_facts)), old_vecs)
+    scores, ids = kb_index.search(model.encode(new_updates, normalize_embeddings=True), k=1, nprobe=4,
+                                  refine_vectors=old_vecs)
+    for update, score, idx in zip(new_updates, scores[:, 0], ids[:, 0]):
+        print(f"\n- NEW UPDATE: {update}\n- closest old fact: {old_facts[idx]} (similarity {score:.2f})")
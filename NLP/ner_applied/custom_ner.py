@@ -176,6 +176,7 @@ print(f"Number of custom labels: {num_labels}")
 # --- 2. Synthetic Dataset (for demo purposes) ---
 # In real life, this would be a loaded and preprocessed dataset.
 # We create small sentences with custom entities.
+# Entity types that come from known term lists (drugs, SKUs) can be weakly labeled with gazetteer.py instead of by hand.
 raw_train_texts = [
     ["My", "name", "is", "Alice", "Smith", "."],
     ["I", "work", "at", "Google", "Inc", "in", "Mountain", "View", "."],
@@ -220,6 +221,8 @@ def tokenize_and_align_labels(words_list, word_labels_list, tokenizer, label_to_
         all_tokenized_inputs['labels'].append(labels)
     return all_tokenized_inputs
 
+# For large annotation sets (100k+ sentences) see ner_batch_alignment.py:
+# one tokenizer call per shard, NumPy label alignment and an on-disk cache of aligned shards.
 train_encodings = tokenize_and_align_labels(X_train_raw, y_train_raw, tokenizer, label_to_id)
 val_encodings = tokenize_and_align_labels(X_val_raw, y_val_raw, tokenizer, label_to_id)
 
@@ -233,6 +236,8 @@ class NERDataset(Dataset):
     def __len__(self):
         return len(self.encodings['input_ids'])
 
+# Padding everything to 128 wastes most of the compute on short sentences.
+# ner_dynamic_padding.py has a packed dataset, a length-bucketing sampler and a dynamic-padding collator.
 train_dataset = NERDataset(train_encodings)
 val_dataset = NERDataset(val_encodings)
 
@@ -240,6 +245,8 @@ val_dataset = NERDataset(val_encodings)
 model = AutoModelForTokenClassification.from_pretrained(model_checkpoint, num_labels=num_labels, id2label=id_to_label, label2id=label_to_id)
 
 # 6. Define Compute Metrics Function for NER
+# Each seqeval call below re-extracts every entity span. For large validation sets use
+# compute_metrics=NERMetrics(id_to_label) from ner_metrics.py (same numbers, one NumPy pass, streams over eval batches).
 def compute_metrics(p):
     predictions, labels = p
     predictions = np.argmax(predictions, axis=2) # Convert logits to class IDs
@@ -315,6 +322,7 @@ if not os.path.exists(model_save_path):
     # loaded_model = AutoModelForTokenClassification.from_pretrained("bert-base-uncased", num_labels=num_labels)
     exit() # Exit if model is not found
 
+# For CPU serving, ner_cpu_export.py turns this checkpoint into int8 / ONNX variants (with an F1 parity check).
 loaded_tokenizer = AutoTokenizer.from_pretrained(model_save_path)
 loaded_model = AutoModelForTokenClassification.from_pretrained(model_save_path)
 
@@ -328,8 +336,12 @@ id_to_label = loaded_model.config.id2label # Models save their id2label mapping!
 print(f"\nLoaded model labels mapping: {id_to_label}")
 
 # --- 2. Process New Text for Inference ---
+# This walks one sentence at a time. For tagging many documents use NERPredictor (ner_predictor.py):
+# token-budget micro-batches + vectorized span decoding from offset mappings.
 inference_text = "Alice Smith works at Acme Corp in New York City."
 # Tokenize the raw string for inference
+# NOTE: truncation=True drops everything after the model's max length (512 for BERT).
+# For long documents use SlidingWindowNERPredictor (ner_long_documents.py).
 inputs = loaded_tokenizer(inference_text, return_tensors="pt", truncation=True, padding=True)
 
 # --- 3. Run Inference ---
@@ -0,0 +1,230 @@
+'''Dictionary (Gazetteer) Pre-Tagger with an Aho-Corasick Automaton
+Many custom entity types (drug names, product SKUs, ...) come from known lists with hundreds of thousands of terms.
+Running BERT over every sentence just to find them wastes compute. An Aho-Corasick automaton finds ALL dictionary terms
+in one left-to-right pass over a sentence, no matter how many terms the dictionary has.'''
+'''Key Concepts:
+Trie: all terms share common prefixes, e.g. "aspirin" and "aspirin complex" share the "aspirin" node.
+Failure links: when the next word does not continue the current match, jump to the longest suffix that is still a prefix of some term (no backtracking -> linear time).
+Dictionary links: shortcut to the next node on the failure chain that ends a term, so nested matches are reported too.
+Word-level matching: we match sequences of words (not characters), so matches line up with BIO word tags directly.
+Compiled + memory-mapped: the automaton is stored as flat NumPy arrays; np.load(mmap_mode="r") lets many worker processes share one copy from the page cache.
+Weak labels: gazetteer BIO tags can be used as (noisy) training labels, or as a fast path that skips the transformer for sentences that are fully resolved.'''
+import hashlib
+import json
+import os
+import re
+from collections import deque
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*|[^\w\s]")
+ROOT = 0
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text)
+
+
+def word_hashes(words, lowercase=True):
+    """64-bit hash per word: a compact, mmap-friendly replacement for a word -> id dict."""
+    out = np.empty(len(words), dtype=np.uint64)
+    for i, word in enumerate(words):
+        word = word.lower() if lowercase else word
+        out[i] = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+    return out
+
+
+class Gazetteer:
+    ARRAYS = ("vocab", "edge_keys", "edge_targets", "fail", "dict_link", "out_len", "out_type")
+
+    def __init__(self, arrays, types, lowercase=True):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.types = types
+        self.lowercase = lowercase
+
+    @classmethod
+    def build(cls, terms, lowercase=True):
+        """terms: iterable of (term, entity_type); a term is a string or a list of words.
+        If the same term appears with several types, the first one wins."""
+        types, type_index = [], {}
+        children = [{}]  # node -> {word hash: child node}
+        out_len, out_type = [0], [-1]
+
+        for term, entity_type in terms:
+            words = tokenize(term) if isinstance(term, str) else list(term)
+            if not words:
+                continue
+            if entity_type not in type_index:
+                type_index[entity_type] = len(types)
+                types.append(entity_type)
+            node = ROOT
+            for h in word_hashes(words, lowercase).tolist():
+                nxt = children[node].get(h)
+                if nxt is None:
+                    nxt = len(children)
+                    children[node][h] = nxt
+                    children.append({})
+                    out_len.append(0)
+                    out_type.append(-1)
+                node = nxt
+            if out_len[node] == 0:
+                out_len[node] = len(words)
+                out_type[node] = type_index[entity_type]
+
+        # breadth-first pass for failure and dictionary links
+        n_nodes = len(children)
+        fail = np.zeros(n_nodes, dtype=np.int32)
+        dict_link = np.full(n_nodes, -1, dtype=np.int32)
+        queue = deque(children[ROOT].values())  # depth-1 nodes fail to the root
+        while queue:
+            node = queue.popleft()
+            for h, child in children[node].items():
+                f = fail[node]
+                while f != ROOT and h not in children[f]:
+                    f = fail[f]
+                fail[child] = children[f].get(h, ROOT)
+                dict_link[child] = fail[child] if out_len[fail[child]] else dict_link[fail[child]]
+                queue.append(child)
+
+        # flatten the transitions into one sorted array of (node << 32 | word id) keys
+        parents, hashes, targets = [], [], []
+        for node, edges in enumerate(children):
+            for h, child in edges.items():
+                parents.append(node)
+                hashes.append(h)
+                targets.append(child)
+        parents = np.array(parents, dtype=np.uint64)
+        hashes = np.array(hashes, dtype=np.uint64)
+        vocab = np.unique(hashes)
+        word_id = np.searchsorted(vocab, hashes).astype(np.uint64)
+        edge_keys = (parents << np.uint64(32)) | word_id
+        order = np.argsort(edge_keys)
+
+        arrays = {
+            "vocab": vocab,
+            "edge_keys": edge_keys[order],
+            "edge_targets": np.array(targets, dtype=np.int32)[order],
+            "fail": fail,
+            "dict_link": dict_link,
+            "out_len": np.array(out_len, dtype=np.int32),
+            "out_type": np.array(out_type, dtype=np.int32),
+        }
+        return cls(arrays, types, lowercase)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"types": self.types, "lowercase": self.lowercase}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(arrays, meta["types"], meta["lowercase"])
+
+    def _word_ids(self, words):
+        # unknown words get -1 (they can never continue a match)
+        hashes = word_hashes(words, self.lowercase)
+        ids = np.searchsorted(self.vocab, hashes)
+        ids = np.minimum(ids, len(self.vocab) - 1)
+        return np.where(self.vocab[ids] == hashes, ids, -1).tolist()
+
+    def _goto(self, node, word_id):
+        key = (node << 32) | word_id
+        pos = int(np.searchsorted(self.edge_keys, np.uint64(key)))
+        if pos < len(self.edge_keys) and int(self.edge_keys[pos]) == key:
+            return int(self.edge_targets[pos])
+        return -1
+
+    def find_all(self, words):
+        """All dictionary matches (start, end, type) in a list of words, including nested/overlapping ones."""
+        matches = []
+        if not len(self.vocab):
+            return matches
+        node = ROOT
+        for pos, word_id in enumerate(self._word_ids(words)):
+            if word_id < 0:
+                node = ROOT
+                continue
+            nxt = self._goto(node, word_id)
+            while nxt < 0 and node != ROOT:
+                node = int(self.fail[node])
+                nxt = self._goto(node, word_id)
+            node = max(nxt, ROOT)
+
+            out = node if self.out_len[node] else int(self.dict_link[node])
+            while out > 0:
+                length = int(self.out_len[out])
+                matches.append((pos + 1 - length, pos + 1, self.types[self.out_type[out]]))
+                out = int(self.dict_link[out])
+        return matches
+
+    def find(self, words):
+        """Non-overlapping matches, leftmost-longest first."""
+        selected, covered_until = [], 0
+        for start, end, entity_type in sorted(self.find_all(words), key=lambda m: (m[0], -m[1])):
+            if start >= covered_until:
+                selected.append((start, end, entity_type))
+                covered_until = end
+        return selected
+
+    def tag(self, words):
+        """BIO tags for a list of words (same format as the custom_ner.py annotations)."""
+        tags = ["O"] * len(words)
+        for start, end, entity_type in self.find(words):
+            tags[start] = f"B-{entity_type}"
+            for i in range(start + 1, end):
+                tags[i] = f"I-{entity_type}"
+        return tags
+
+    def weak_labels(self, sentences):
+        """Gazetteer BIO tags for many pre-split sentences, to use as weak training labels."""
+        return [self.tag(words) for words in sentences]
+
+
+def pretag(sentences, gazetteer, outside_words=frozenset()):
+    """Fast path for inference. A sentence counts as resolved when every word is either inside a gazetteer match
+    or a known non-entity word (outside_words, e.g. punctuation and stopwords); only unresolved sentences need the model.
+    Returns (tags per sentence, list of indices that still need the transformer)."""
+    all_tags, needs_model = [], []
+    for i, words in enumerate(sentences):
+        tags = gazetteer.tag(words)
+        all_tags.append(tags)
+        if any(tag == "O" and word.lower() not in outside_words for word, tag in zip(words, tags)):
+            needs_model.append(i)
+    return all_tags, needs_model
+
+
+if __name__ == "__main__":
+    import time
+
+    terms = [
+        ("aspirin", "DRUG"),
+        ("aspirin complex", "DRUG"),
+        ("ibuprofen", "DRUG"),
+        ("vitamin c", "DRUG"),
+        ("SKU-10023", "PRODUCT"),
+        ("iPhone 15", "PRODUCT"),
+    ]
+    # 500k synthetic terms, like a real drug / SKU list
+    terms += [(f"SKU-{i:07d}", "PRODUCT") for i in range(500_000)]
+
+    start = time.perf_counter()
+    gazetteer = Gazetteer.build(terms)
+    print(f"Built automaton with {len(gazetteer.fail):,} nodes in {time.perf_counter() - start:.1f}s")
+
+    gazetteer.save("./gazetteer_automaton")
+    gazetteer = Gazetteer.load("./gazetteer_automaton")  # memory-mapped: workers share the same pages
+
+    words = tokenize("Take aspirin complex with vitamin C , then order SKU-0000042 and an iPhone 15 .")
+    print(list(zip(words, gazetteer.tag(words))))
+
+    stop = {".", ",", "take", "with", "then", "order", "and", "an"}
+    sentences = [tokenize("aspirin and ibuprofen ."), tokenize("Alice bought an iPhone 15 .")]
+    tags, needs_model = pretag(sentences, gazetteer, outside_words=stop)
+    print(f"Sentences that still need the transformer: {needs_model}")
@@ -0,0 +1,187 @@
+'''Batched Label Alignment for Large NER Datasets
+The `tokenize_and_align_labels` function in custom_ner.py calls the tokenizer once per sentence (padded to 128) and then walks word_ids() in a Python loop.
+That is fine for 5 demo sentences, but with hundreds of thousands of annotated sentences the preprocessing takes longer than a training epoch.
+Here we tokenize a whole shard with ONE call to the fast (Rust) tokenizer, build the -100 label masks with NumPy, and cache the aligned shards on disk.'''
+'''Key Concepts:
+One tokenizer call per shard: the fast tokenizer parallelizes a list of sentences internally, so one big call beats thousands of small ones.
+No padding at alignment time: sentences are stored unpadded, back to back ("packed"), plus an offsets array telling where each sentence starts.
+Vectorized alignment: "first subword of a word" = token whose word id differs from the previous token's word id (within the same sentence).
+Disk cache: the key is a hash of the tokenizer vocabulary, the label map, max_length and the shard text, so re-runs skip tokenization entirely.'''
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from itertools import chain
+
+import numpy as np
+
+IGNORE_INDEX = -100  # ignored by the PyTorch cross-entropy loss
+
+
+def align_shard(words_list, word_labels_list, tokenizer, label_to_id, max_length=128):
+    """Tokenize a shard of pre-split sentences in one call and align word labels to subword tokens.
+    Returns a packed shard: {'input_ids', 'labels', 'offsets'} where sentence i is input_ids[offsets[i]:offsets[i+1]]."""
+    if not tokenizer.is_fast:
+        raise ValueError("align_shard needs a fast tokenizer (word_ids() comes from the Rust backend)")
+
+    words_list = list(words_list)
+    if not words_list:  # the tokenizer rejects an empty batch
+        return {"input_ids": np.zeros(0, np.int32), "labels": np.zeros(0, np.int64), "offsets": np.zeros(1, np.int64)}
+
+    # 1. one tokenizer call for the whole shard, no padding (padding is done per batch later)
+    encoded = tokenizer(words_list, is_split_into_words=True, truncation=True, max_length=max_length)
+    n_sentences = len(encoded["input_ids"])
+
+    lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=n_sentences)
+    offsets = np.zeros(n_sentences + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    input_ids = np.fromiter(chain.from_iterable(encoded["input_ids"]), dtype=np.int32, count=offsets[-1])
+
+    # 2. word ids of every token in the shard, flattened. None (special tokens) -> NaN -> -1
+    word_ids = np.array(
+        list(chain.from_iterable(encoded.word_ids(i) for i in range(n_sentences))), dtype=np.float64
+    )
+    word_ids = np.nan_to_num(word_ids, nan=-1).astype(np.int64)
+    sentence_of_token = np.repeat(np.arange(n_sentences), lengths)
+
+    # 3. word-level label ids, flattened, plus where each sentence's words start
+    word_counts = np.fromiter((len(w) for w in words_list), dtype=np.int64, count=n_sentences)
+    word_offsets = np.zeros(n_sentences, dtype=np.int64)
+    np.cumsum(word_counts[:-1], out=word_offsets[1:])
+    flat_word_labels = np.fromiter(
+        map(label_to_id.__getitem__, chain.from_iterable(word_labels_list)), dtype=np.int64, count=word_counts.sum()
+    )
+
+    # 4. a token gets its word's label only if it is the first subword of that word
+    is_first = word_ids >= 0
+    is_first[1:] &= (word_ids[1:] != word_ids[:-1]) | (sentence_of_token[1:] != sentence_of_token[:-1])
+    labels = np.full(offsets[-1], IGNORE_INDEX, dtype=np.int64)
+    labels[is_first] = flat_word_labels[word_offsets[sentence_of_token[is_first]] + word_ids[is_first]]
+
+    return {"input_ids": input_ids, "labels": labels, "offsets": offsets}
+
+
+def unpack_shard(shard):
+    """Turn a packed shard back into the list-of-lists layout used by custom_ner.NERDataset."""
+    if len(shard["offsets"]) == 1:  # empty shard (np.split would return one empty sentence)
+        return {"input_ids": [], "attention_mask": [], "labels": []}
+    bounds = shard["offsets"][1:-1]
+    input_ids = [ids.tolist() for ids in np.split(shard["input_ids"], bounds)]
+    return {
+        "input_ids": input_ids,
+        "attention_mask": [[1] * len(ids) for ids in input_ids],
+        "labels": [lab.tolist() for lab in np.split(shard["labels"], bounds)],
+    }
+
+
+def tokenizer_fingerprint(tokenizer):
+    # the serialized Rust tokenizer covers vocab, normalizer and pre-tokenizer settings
+    h = hashlib.sha1(type(tokenizer).__name__.encode())
+    h.update(tokenizer.backend_tokenizer.to_str().encode())
+    return h.hexdigest()
+
+
+def shard_cache_key(words_list, word_labels_list, tokenizer_fp, label_to_id, max_length):
+    h = hashlib.sha1()
+    h.update(tokenizer_fp.encode())
+    h.update(json.dumps(label_to_id, sort_keys=True).encode())
+    h.update(str(max_length).encode())
+    for words, labels in zip(words_list, word_labels_list):
+        h.update("\x1f".join(words).encode())
+        h.update(b"\x1e")
+        h.update("\x1f".join(labels).encode())
+        h.update(b"\x1d")
+    return h.hexdigest()
+
+
+def load_or_align_shard(words_list, word_labels_list, tokenizer, label_to_id, cache_dir,
+                        max_length=128, tokenizer_fp=None, mmap=True):
+    """Return the aligned shard from cache_dir, aligning (and caching) it first if needed."""
+    tokenizer_fp = tokenizer_fp or tokenizer_fingerprint(tokenizer)
+    key = shard_cache_key(words_list, word_labels_list, tokenizer_fp, label_to_id, max_length)
+    shard_dir = os.path.join(cache_dir, key)
+    mmap_mode = "r" if mmap else None
+
+    if os.path.isdir(shard_dir):
+        return {name: np.load(os.path.join(shard_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+                for name in ("input_ids", "labels", "offsets")}
+
+    shard = align_shard(words_list, word_labels_list, tokenizer, label_to_id, max_length)
+    # write to a temp dir first and rename, so a crashed run never leaves a half-written shard behind
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    for name, arr in shard.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+    try:
+        os.rename(tmp_dir, shard_dir)
+    except OSError:  # another worker cached the same shard first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return shard
+
+
+def concat_shards(shards):
+    """Merge packed shards into one packed shard (offsets are rebased)."""
+    shards = list(shards)
+    offsets = [shards[0]["offsets"]] if shards else [np.zeros(1, dtype=np.int64)]
+    total = offsets[0][-1]
+    for shard in shards[1:]:
+        offsets.append(shard["offsets"][1:] + total)
+        total += shard["offsets"][-1]
+    return {
+        "input_ids": np.concatenate([s["input_ids"] for s in shards]) if shards else np.zeros(0, np.int32),
+        "labels": np.concatenate([s["labels"] for s in shards]) if shards else np.zeros(0, np.int64),
+        "offsets": np.concatenate(offsets),
+    }
+
+
+def align_corpus(words_list, word_labels_list, tokenizer, label_to_id, cache_dir=None,
+                 shard_size=20000, max_length=128):
+    """Align a whole corpus shard by shard (cached when cache_dir is given) and return one packed shard."""
+    tokenizer_fp = tokenizer_fingerprint(tokenizer) if cache_dir else None
+    shards = []
+    for start in range(0, len(words_list), shard_size):
+        words = words_list[start:start + shard_size]
+        labels = word_labels_list[start:start + shard_size]
+        if cache_dir:
+            shards.append(load_or_align_shard(words, labels, tokenizer, label_to_id, cache_dir,
+                                              max_length=max_length, tokenizer_fp=tokenizer_fp))
+        else:
+            shards.append(align_shard(words, labels, tokenizer, label_to_id, max_length))
+    return concat_shards(shards)
+
+
+if __name__ == "__main__":
+    import time
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+    custom_tags = ["O", "B-PERSON", "I-PERSON", "B-ORG", "I-ORG", "B-LOCATION", "I-LOCATION"]
+    label_to_id = {tag: i for i, tag in enumerate(custom_tags)}
+
+    raw_texts = [
+        ["My", "name", "is", "Alice", "Smith", "."],
+        ["I", "work", "at", "Google", "Inc", "in", "Mountain", "View", "."],
+        ["John", "Doe", "travels", "to", "Paris", "often", "."],
+    ]
+    raw_labels = [
+        ["O", "O", "O", "B-PERSON", "I-PERSON", "O"],
+        ["O", "O", "O", "B-ORG", "I-ORG", "O", "B-LOCATION", "I-LOCATION", "O"],
+        ["B-PERSON", "I-PERSON", "O", "O", "B-LOCATION", "O", "O"],
+    ]
+
+    shard = align_shard(raw_texts, raw_labels, tokenizer, label_to_id)
+    print(f"Packed input_ids: {shard['input_ids'].shape}, offsets: {shard['offsets']}")
+    print(f"Sentence 0 labels: {unpack_shard(shard)['labels'][0]}")
+
+    # scale the demo corpus up to see the difference
+    big_texts, big_labels = raw_texts * 20000, raw_labels * 20000
+    cache_dir = "./ner_align_cache"
+
+    start = time.perf_counter()
+    align_corpus(big_texts, big_labels, tokenizer, label_to_id, cache_dir=cache_dir)
+    print(f"Cold run (tokenize + align + cache): {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    packed = align_corpus(big_texts, big_labels, tokenizer, label_to_id, cache_dir=cache_dir)
+    print(f"Warm run (from cache): {time.perf_counter() - start:.2f}s, {len(packed['offsets']) - 1} sentences")
@@ -0,0 +1,204 @@
+'''CPU Serving: Dynamic INT8 Quantization and ONNX Export for the Fine-tuned NER Model
+The checkpoint saved by the Trainer in custom_ner.py runs in fp32, eager PyTorch. On CPU-only nodes most of the time goes into the Linear layers of BERT.
+Dynamic quantization stores Linear weights as int8 and quantizes activations on the fly, ONNX Runtime runs an optimized, fused graph.
+Faster is only useful if the entities stay the same, so every exported variant is checked for entity-level F1 parity on the validation split.'''
+'''Key Concepts:
+Dynamic quantization: weights are converted to int8 ahead of time, activations per batch at runtime. No calibration data needed, works well for Transformers on CPU.
+ONNX: a framework-independent graph format. dynamic_axes keeps batch size and sequence length variable.
+Parity check: compare entity-level (seqeval) F1 of each variant against the fp32 model, not just raw logits.
+Latency: report p50/p95 per batch and sentences per second for batch sizes 1, 8 and 32.'''
+import os
+import time
+
+import numpy as np
+import torch
+from seqeval.metrics import f1_score  # type: ignore
+
+from ner_batch_alignment import IGNORE_INDEX
+
+
+# --- 1. Export ---
+def quantize_int8(model):
+    """Dynamic int8 quantization of all Linear layers (CPU only)."""
+    model = model.to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(quantized_model, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save(quantized_model.state_dict(), path)
+
+
+def load_quantized(model_checkpoint, path):
+    # rebuild the same quantized structure, then load the int8 weights into it
+    from transformers import AutoModelForTokenClassification
+
+    model = quantize_int8(AutoModelForTokenClassification.from_pretrained(model_checkpoint))
+    model.load_state_dict(torch.load(path))
+    return model
+
+
+def export_onnx(model, path, opset_version=17, quantize=True):
+    """Export to ONNX with dynamic batch/sequence axes; optionally write an int8 copy next to it (*.int8.onnx)."""
+    model = model.to("cpu").eval()
+    dummy = torch.ones((2, 16), dtype=torch.int64)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.onnx.export(
+        model,
+        (dummy, dummy),
+        path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        },
+        opset_version=opset_version,
+    )
+    if not quantize:
+        return path, None
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+    return path, int8_path
+
+
+# --- 2. Backends: all take (input_ids, attention_mask) as int64 NumPy arrays and return logits ---
+def torch_backend(model):
+    model = model.to("cpu").eval()
+
+    def run(input_ids, attention_mask):
+        with torch.inference_mode():
+            return model(input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask)).logits.numpy()
+    return run
+
+
+def onnx_backend(path, num_threads=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def run(input_ids, attention_mask):
+        return session.run(["logits"], {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+    return run
+
+
+# --- 3. Parity and benchmark ---
+def padded_batches(packed, batch_size, pad_token_id=0):
+    """(input_ids, attention_mask, labels) NumPy batches from a packed shard (see ner_batch_alignment.py)."""
+    offsets = packed["offsets"]
+    for first in range(0, len(offsets) - 1, batch_size):
+        rows = range(first, min(first + batch_size, len(offsets) - 1))
+        seq = max(offsets[r + 1] - offsets[r] for r in rows)
+        input_ids = np.full((len(rows), seq), pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), seq), dtype=np.int64)
+        labels = np.full((len(rows), seq), IGNORE_INDEX, dtype=np.int64)
+        for i, r in enumerate(rows):
+            start, end = offsets[r], offsets[r + 1]
+            input_ids[i, :end - start] = packed["input_ids"][start:end]
+            attention_mask[i, :end - start] = 1
+            labels[i, :end - start] = packed["labels"][start:end]
+        yield input_ids, attention_mask, labels
+
+
+def tile_packed(packed, n_sentences):
+    """A packed shard of exactly n_sentences sentences, cycling through the sentences of `packed`."""
+    offsets = packed["offsets"]
+    rows = np.arange(n_sentences) % (len(offsets) - 1)
+    lengths = np.diff(offsets)[rows]
+    new_offsets = np.zeros(n_sentences + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    # token positions of every chosen sentence, back to back
+    tokens = np.repeat(offsets[rows] - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return {"input_ids": packed["input_ids"][tokens], "labels": packed["labels"][tokens], "offsets": new_offsets}
+
+
+def entity_f1(backend, packed, id_to_label, batch_size=32, pad_token_id=0):
+    true_tags, pred_tags = [], []
+    for input_ids, attention_mask, labels in padded_batches(packed, batch_size, pad_token_id):
+        predictions = backend(input_ids, attention_mask).argmax(axis=-1)
+        for pred_row, label_row in zip(predictions, labels):
+            keep = label_row != IGNORE_INDEX
+            true_tags.append([id_to_label[int(l)] for l in label_row[keep]])
+            pred_tags.append([id_to_label[int(p)] for p in pred_row[keep]])
+    return float(f1_score(true_tags, pred_tags))
+
+
+def parity_check(backends, packed, id_to_label, reference="fp32", tolerance=0.005, pad_token_id=0):
+    """Entity-level F1 of every backend and its difference to the reference backend."""
+    scores = {name: entity_f1(run, packed, id_to_label, pad_token_id=pad_token_id) for name, run in backends.items()}
+    return {
+        name: {"f1": f1, "delta": f1 - scores[reference], "ok": abs(f1 - scores[reference]) <= tolerance}
+        for name, f1 in scores.items()
+    }
+
+
+def benchmark_latency(backends, packed, batch_sizes=(1, 8, 32), n_batches=30, warmup=3, pad_token_id=0):
+    results = {}
+    for batch_size in batch_sizes:
+        # every timed batch has exactly batch_size rows, however few sentences the shard has
+        tiled = tile_packed(packed, batch_size * (n_batches + warmup))
+        batches = list(padded_batches(tiled, batch_size, pad_token_id))
+        for name, run in backends.items():
+            latencies, n_sentences = [], 0
+            for i, (input_ids, attention_mask, _) in enumerate(batches):
+                start = time.perf_counter()
+                run(input_ids, attention_mask)
+                if i >= warmup:
+                    latencies.append(time.perf_counter() - start)
+                    n_sentences += input_ids.shape[0]
+            latencies = np.array(latencies)
+            results[(name, batch_size)] = {
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p95_ms": float(np.percentile(latencies, 95) * 1000),
+                "sentences_per_s": float(n_sentences / latencies.sum()),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    from ner_batch_alignment import align_corpus
+
+    model_save_path = "./ner_results/checkpoint-4"  # checkpoint written by the Trainer in custom_ner.py
+    if not os.path.exists(model_save_path):
+        print(f"Model checkpoint path not found: {model_save_path}. Please run the fine-tuning first.")
+        exit()
+
+    tokenizer = AutoTokenizer.from_pretrained(model_save_path)
+    model = AutoModelForTokenClassification.from_pretrained(model_save_path)
+    id_to_label = model.config.id2label
+    label_to_id = {label: int(i) for i, label in id_to_label.items()}
+
+    # validation split (same sentences as X_val_raw / y_val_raw in custom_ner.py)
+    val_texts = [["He", "met", "Dr.", "Jane", "Doe", "at", "the", "conference", "."]]
+    val_labels = [["O", "O", "O", "B-PERSON", "I-PERSON", "O", "O", "O", "O"]]
+    val_packed = align_corpus(val_texts, val_labels, tokenizer, label_to_id)
+
+    int8_model = quantize_int8(AutoModelForTokenClassification.from_pretrained(model_save_path))
+    save_quantized(int8_model, "./ner_cpu/model.int8.pt")
+    onnx_path, onnx_int8_path = export_onnx(model, "./ner_cpu/model.onnx")
+
+    backends = {
+        "fp32": torch_backend(model),
+        "torch-int8": torch_backend(int8_model),
+        "onnx-fp32": onnx_backend(onnx_path),
+        "onnx-int8": onnx_backend(onnx_int8_path),
+    }
+
+    print("\n--- Entity-level F1 parity (vs fp32) ---")
+    for name, result in parity_check(backends, val_packed, id_to_label, pad_token_id=tokenizer.pad_token_id).items():
+        print(f"  {name:<11} F1={result['f1']:.4f}  delta={result['delta']:+.4f}  {'OK' if result['ok'] else 'DRIFT'}")
+
+    # the 1-sentence validation set is only used for the F1 parity check; benchmark_latency tiles it into full batches
+    print("\n--- Latency / throughput on CPU ---")
+    for (name, batch_size), r in benchmark_latency(backends, val_packed, pad_token_id=tokenizer.pad_token_id).items():
+        print(f"  {name:<11} bs={batch_size:<3} p50={r['p50_ms']:.1f}ms  p95={r['p95_ms']:.1f}ms  "
+              f"{r['sentences_per_s']:.0f} sent/s")
@@ -0,0 +1,200 @@
+'''Dynamic Padding and Length-Bucketed Batching for NER Training
+NERDataset in custom_ner.py pads every sentence to 128 tokens and builds a new torch.tensor for every field on every __getitem__.
+Most real sentences are far shorter than 128 tokens, so most of the Trainer's compute goes into attention over [PAD] tokens.
+Here the encodings live in a few preallocated, contiguous tensors, batches are built from sentences of similar length, and each batch is padded only to its own longest member.'''
+'''Key Concepts:
+Packed storage: all sentences back to back in one flat tensor + an offsets tensor. __getitem__ returns views (slices), no new allocation per item.
+Length bucketing: shuffle, cut into "mega-batches", sort each mega-batch by length, then cut into batches -> batches contain similar lengths.
+Dynamic padding: the collator pads to the longest sentence of the batch (optionally rounded up to a multiple of 8 for tensor cores).
+Labels are padded with -100 so the loss still ignores padding.'''
+import random
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, Sampler
+from transformers import Trainer
+
+from ner_batch_alignment import IGNORE_INDEX
+
+
+class PackedNERDataset(Dataset):
+    def __init__(self, packed):
+        # one contiguous tensor per field, created once
+        self.input_ids = torch.as_tensor(np.asarray(packed["input_ids"]), dtype=torch.int32).contiguous()
+        self.labels = torch.as_tensor(np.asarray(packed["labels"]), dtype=torch.int64).contiguous()
+        self.offsets = torch.as_tensor(np.asarray(packed["offsets"]), dtype=torch.int64).contiguous()
+        self.lengths = (self.offsets[1:] - self.offsets[:-1]).tolist()
+        self._starts = self.offsets[:-1].tolist()
+
+    @classmethod
+    def from_encodings(cls, encodings):
+        """Build from the padded list-of-lists layout of custom_ner.tokenize_and_align_labels (padding is stripped)."""
+        lengths = [sum(mask) for mask in encodings["attention_mask"]]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        input_ids = np.concatenate([ids[:n] for ids, n in zip(encodings["input_ids"], lengths)]) if lengths else []
+        labels = np.concatenate([lab[:n] for lab, n in zip(encodings["labels"], lengths)]) if lengths else []
+        return cls({"input_ids": input_ids, "labels": labels, "offsets": offsets})
+
+    def __getitem__(self, idx):
+        start = self._starts[idx]
+        end = start + self.lengths[idx]
+        return {"input_ids": self.input_ids[start:end], "labels": self.labels[start:end]}
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+class LengthBucketBatchSampler(Sampler):
+    """Yields batches of indices whose sentences have similar lengths."""
+
+    def __init__(self, lengths, batch_size, bucket_size_multiplier=50, shuffle=True, drop_last=False, seed=42):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.mega_batch_size = batch_size * bucket_size_multiplier
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = random.Random(self.seed + self.epoch)
+        indices = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(indices)
+
+        batches = []
+        for start in range(0, len(indices), self.mega_batch_size):
+            mega_batch = sorted(indices[start:start + self.mega_batch_size], key=self.lengths.__getitem__)
+            for b in range(0, len(mega_batch), self.batch_size):
+                batch = mega_batch[b:b + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch)
+
+        if self.shuffle:
+            rng.shuffle(batches)  # otherwise every epoch would go short -> long
+        self.epoch += 1
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+        full, rest = divmod(len(self.lengths), self.mega_batch_size)
+        return full * -(-self.mega_batch_size // self.batch_size) + -(-rest // self.batch_size)
+
+
+class DynamicPaddingCollator:
+    """Pads a list of PackedNERDataset items to the longest item in the batch."""
+
+    def __init__(self, pad_token_id=0, pad_to_multiple_of=None, return_token_type_ids=True):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.return_token_type_ids = return_token_type_ids
+
+    def __call__(self, items):
+        max_len = max(len(item["input_ids"]) for item in items)
+        if self.pad_to_multiple_of:
+            max_len = -(-max_len // self.pad_to_multiple_of) * self.pad_to_multiple_of
+
+        input_ids = torch.full((len(items), max_len), self.pad_token_id, dtype=torch.int64)
+        labels = torch.full((len(items), max_len), IGNORE_INDEX, dtype=torch.int64)
+        attention_mask = torch.zeros((len(items), max_len), dtype=torch.int64)
+        for row, item in enumerate(items):
+            n = len(item["input_ids"])
+            input_ids[row, :n] = item["input_ids"]
+            labels[row, :n] = item["labels"]
+            attention_mask[row, :n] = 1
+
+        batch = {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+        if self.return_token_type_ids:
+            batch["token_type_ids"] = torch.zeros_like(input_ids)
+        return batch
+
+
+class BucketedTrainer(Trainer):
+    """Hugging Face Trainer that feeds length-bucketed, dynamically padded batches."""
+
+    def _bucketed_loader(self, dataset, batch_size, shuffle):
+        sampler = LengthBucketBatchSampler(dataset.lengths, batch_size, shuffle=shuffle, seed=self.args.seed)
+        loader = DataLoader(
+            dataset,
+            batch_sampler=sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        # like the base Trainer: device placement, and per-process sharding of the batches under DDP
+        return self.accelerator.prepare(loader)
+
+    def get_train_dataloader(self):
+        return self._bucketed_loader(self.train_dataset, self.args.train_batch_size, shuffle=True)
+
+    def get_eval_dataloader(self, eval_dataset=None):
+        dataset = eval_dataset if eval_dataset is not None else self.eval_dataset
+        return self._bucketed_loader(dataset, self.args.eval_batch_size, shuffle=False)
+
+
+def benchmark_tokens_per_second(model, loader, max_batches=50):
+    """Forward + backward over a loader; returns real (non-pad) tokens per second."""
+    import time
+
+    model.train()
+    real_tokens, start = 0, time.perf_counter()
+    for step, batch in enumerate(loader):
+        if step == max_batches:
+            break
+        model(**batch).loss.backward()
+        model.zero_grad(set_to_none=True)
+        real_tokens += int(batch["attention_mask"].sum())
+    return real_tokens / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForTokenClassification, AutoTokenizer, default_data_collator
+
+    from ner_batch_alignment import align_corpus
+
+    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+    custom_tags = ["O", "B-PERSON", "I-PERSON", "B-ORG", "I-ORG", "B-LOCATION", "I-LOCATION"]
+    label_to_id = {tag: i for i, tag in enumerate(custom_tags)}
+
+    raw_texts = [
+        ["My", "name", "is", "Alice", "Smith", "."],
+        ["I", "work", "at", "Google", "Inc", "in", "Mountain", "View", "."],
+        ["John", "Doe", "travels", "to", "Paris", "often", "."],
+        ["Microsoft", "Corp", "is", "based", "in", "Redmond", "."],
+    ] * 200
+    raw_labels = [
+        ["O", "O", "O", "B-PERSON", "I-PERSON", "O"],
+        ["O", "O", "O", "B-ORG", "I-ORG", "O", "B-LOCATION", "I-LOCATION", "O"],
+        ["B-PERSON", "I-PERSON", "O", "O", "B-LOCATION", "O", "O"],
+        ["B-ORG", "I-ORG", "O", "O", "O", "B-LOCATION", "O"],
+    ] * 200
+
+    model = AutoModelForTokenClassification.from_pretrained("bert-base-uncased", num_labels=len(custom_tags))
+
+    # before: every sentence padded to 128 (like custom_ner.py)
+    padded = tokenizer(raw_texts, is_split_into_words=True, truncation=True, padding="max_length", max_length=128)
+    packed = align_corpus(raw_texts, raw_labels, tokenizer, label_to_id)
+    dataset = PackedNERDataset(packed)
+    padded_labels = [row.tolist() + [IGNORE_INDEX] * (128 - len(row)) for row in
+                     (dataset[i]["labels"] for i in range(len(dataset)))]
+    static_items = [{"input_ids": ids, "attention_mask": mask, "labels": lab}
+                    for ids, mask, lab in zip(padded["input_ids"], padded["attention_mask"], padded_labels)]
+    static_loader = DataLoader(static_items, batch_size=16, collate_fn=default_data_collator)
+
+    # after: packed dataset + bucketed batches + dynamic padding
+    collator = DynamicPaddingCollator(pad_token_id=tokenizer.pad_token_id)
+    bucketed_loader = DataLoader(dataset, batch_sampler=LengthBucketBatchSampler(dataset.lengths, 16), collate_fn=collator)
+
+    before = benchmark_tokens_per_second(model, static_loader, max_batches=10)
+    after = benchmark_tokens_per_second(model, bucketed_loader, max_batches=10)
+    print(f"Static padding to 128:   {before:,.0f} tokens/s")
+    print(f"Bucketed dynamic padding: {after:,.0f} tokens/s ({after / before:.1f}x)")
+
+    # Using it with the Trainer: pass the collator and use BucketedTrainer instead of Trainer
+    # trainer = BucketedTrainer(model=model, args=training_args, train_dataset=dataset,
+    #                           eval_dataset=val_dataset, data_collator=collator, compute_metrics=compute_metrics)
@@ -0,0 +1,116 @@
+'''Long-Document NER with Sliding Windows
+The inference code in custom_ner.py (and NERPredictor) uses truncation=True, so every entity after token 512 is silently dropped.
+Contracts and clinical notes are often thousands of tokens long.
+SlidingWindowNERPredictor splits each document into overlapping windows, runs all windows through the model as batches,
+averages the logits of tokens that appear in more than one window, and rebuilds the entities in the original character offsets.'''
+'''Key Concepts:
+stride: number of tokens shared by two neighbouring windows. More overlap = more context at window edges, but more compute.
+Single tokenization: the fast tokenizer produces all windows in one call (return_overflowing_tokens=True), each window is tokenized once.
+overflow_to_sample_mapping: tells which document each window came from.
+Logit merging: a token is identified by its character start offset, so the copies of a token in overlapping windows are averaged.
+Overlap overhead: (tokens run through the model) / (unique document tokens) - 1, reported in .stats.'''
+import numpy as np
+import torch
+
+from ner_predictor import EntitySpan, NERPredictor, decode_spans
+
+
+class SlidingWindowNERPredictor(NERPredictor):
+    def __init__(self, model, tokenizer, stride=128, **kwargs):
+        super().__init__(model, tokenizer, **kwargs)
+        if not 0 <= stride < self.max_length - tokenizer.num_special_tokens_to_add():
+            raise ValueError(f"stride must be smaller than the window content length, got {stride}")
+        self.stride = stride
+        self.stats = {"documents": 0, "windows": 0, "window_tokens": 0, "document_tokens": 0}
+
+    def overlap_overhead(self):
+        """Extra model work caused by the overlap, as a fraction (0.25 = 25% more tokens than the documents have)."""
+        if not self.stats["document_tokens"]:
+            return 0.0
+        return self.stats["window_tokens"] / self.stats["document_tokens"] - 1
+
+    def _encode(self, texts):
+        return self.tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=self.max_length,
+            stride=self.stride,
+            return_overflowing_tokens=True,
+            return_offsets_mapping=True,
+        )
+
+    def _predict_chunk(self, chunk):
+        doc_ids = [doc_id for doc_id, _ in chunk]
+        encoded = self._encode(text for _, text in chunk)
+        window_doc = np.asarray(encoded["overflow_to_sample_mapping"])
+        lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(window_doc))
+
+        # per document: list of (char starts, char ends, word ids, logits) for the real tokens of each window
+        pieces = [[] for _ in chunk]
+        for rows in self._micro_batches(lengths):
+            input_ids, attention_mask, word_ids, offsets = self._pad(encoded, rows)
+            logits = self._logits(input_ids, attention_mask).cpu().numpy()
+            real = word_ids >= 0
+            for i, window in enumerate(rows):
+                keep = real[i]
+                pieces[window_doc[window]].append(
+                    (offsets[i, keep, 0], offsets[i, keep, 1], word_ids[i, keep], logits[i, keep])
+                )
+                self.stats["window_tokens"] += int(keep.sum())
+        self.stats["windows"] += len(window_doc)
+        self.stats["documents"] += len(chunk)
+
+        for doc, doc_pieces in enumerate(pieces):
+            yield from self._stitch(doc_ids[doc], doc_pieces)
+
+    def _stitch(self, doc_id, doc_pieces):
+        if not doc_pieces:
+            return
+        starts = np.concatenate([p[0] for p in doc_pieces])
+        ends = np.concatenate([p[1] for p in doc_pieces])
+        word_ids = np.concatenate([p[2] for p in doc_pieces])
+        logits = np.concatenate([p[3] for p in doc_pieces])
+
+        # merge token copies from overlapping windows: average their logits
+        token_starts, first, inverse, counts = np.unique(starts, return_index=True, return_inverse=True,
+                                                         return_counts=True)
+        merged = np.zeros((len(token_starts), logits.shape[1]), dtype=np.float64)
+        np.add.at(merged, inverse, logits)
+        merged /= counts[:, None]
+        self.stats["document_tokens"] += len(token_starts)
+
+        probs = torch.from_numpy(merged).softmax(dim=-1).numpy()
+        label_ids = probs.argmax(axis=-1)
+        scores = probs[np.arange(len(label_ids)), label_ids]
+        offsets = np.stack([token_starts, ends[first]], axis=-1)
+
+        _, span_start, span_end, type_id, span_score = decode_spans(
+            label_ids[None], scores[None], word_ids[first][None], offsets[None], self.is_begin, self.type_of
+        )
+        for s, e, t, sc in zip(span_start.tolist(), span_end.tolist(), type_id.tolist(), span_score.tolist()):
+            yield EntitySpan(doc_id, s, e, self.types[t], sc)
+
+
+if __name__ == "__main__":
+    import os
+
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    model_save_path = "./ner_results/checkpoint-4"
+    if not os.path.exists(model_save_path):
+        print(f"Model checkpoint path not found: {model_save_path}. Please run the fine-tuning first.")
+        exit()
+
+    predictor = SlidingWindowNERPredictor(
+        AutoModelForTokenClassification.from_pretrained(model_save_path),
+        AutoTokenizer.from_pretrained(model_save_path),
+        max_length=512,
+        stride=128,
+    )
+
+    # ~2,000 tokens: far past the 512 limit of the plain inference path
+    long_text = " ".join(["Alice Smith signed the agreement with Acme Corp in New York City."] * 150)
+    entities = list(predictor.predict([("contract-1", long_text)]))
+    print(f"Found {len(entities)} entities; last one ends at char {entities[-1].end if entities else 0} "
+          f"of {len(long_text)}")
+    print(f"Windows: {predictor.stats['windows']}, overlap overhead: {predictor.overlap_overhead():.1%}")
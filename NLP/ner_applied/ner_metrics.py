@@ -0,0 +1,175 @@
+'''Fast, Incremental seqeval-Compatible NER Metrics
+compute_metrics in custom_ner.py turns every prediction back into label strings with nested list comprehensions and then calls seqeval
+four times (precision, recall, f1, report); every call re-extracts the entity spans from scratch. On a big validation set evaluation is slower than training.
+NERMetrics extracts spans directly from the integer label arrays with NumPy, counts everything in one pass,
+can accumulate over eval batches, and returns the same numbers as seqeval (default, non-strict mode).'''
+'''Key Concepts:
+Span rule (seqeval default mode): an entity starts at B-X, or at I-X when the previous tag is O or has another type; it ends before O, B-* or a type change.
+Sentence boundaries: positions labeled -100 are dropped and every sentence starts fresh, like seqeval's 'O' separator between sentences.
+True positive: a predicted entity with exactly the same (type, start, end) as a gold entity.
+Streaming: only three counters per type (true positives, predicted, gold) are kept between batches, so memory does not grow with the eval set.
+With TrainingArguments(batch_eval_metrics=True) the Trainer calls compute_metrics per batch and passes compute_result=True on the last one.'''
+import numpy as np
+
+IGNORE_INDEX = -100
+
+
+def build_tag_tables(id_to_label):
+    """label id -> (is B-, entity type id); types sorted by name, type -1 = O."""
+    types = sorted({label.split("-", 1)[1] for label in id_to_label.values() if "-" in label})
+    type_index = {name: i for i, name in enumerate(types)}
+    size = max(int(i) for i in id_to_label) + 1
+    is_begin = np.zeros(size, dtype=bool)
+    type_of = np.full(size, -1, dtype=np.int64)
+    for label_id, label in id_to_label.items():
+        if "-" in label:
+            prefix, name = label.split("-", 1)
+            is_begin[int(label_id)] = prefix == "B"
+            type_of[int(label_id)] = type_index[name]
+    return is_begin, type_of, types
+
+
+def entity_keys(tag_ids, sentence_start, is_begin, type_of):
+    """One int64 key per entity in a flat tag array: (start * n + end) * n_types + type.
+    sentence_start marks the first kept position of every sentence."""
+    n = len(tag_ids)
+    typ = type_of[tag_ids]
+    prev_typ = np.empty_like(typ)
+    prev_typ[0:1] = -1
+    prev_typ[1:] = typ[:-1]
+    prev_typ[sentence_start] = -1
+    inside = typ >= 0
+    starts = inside & (is_begin[tag_ids] | (prev_typ != typ))
+
+    positions = np.flatnonzero(inside)
+    if positions.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    span_id = np.cumsum(starts)[positions] - 1
+    boundaries = np.flatnonzero(np.diff(span_id)) + 1
+    first = positions[np.r_[0, boundaries]]
+    last = positions[np.r_[boundaries - 1, positions.size - 1]]
+    span_type = typ[first]
+    n_types = max(int(type_of.max()) + 1, 1)
+    return (first * (n + 1) + last) * n_types + span_type, span_type
+
+
+class NERMetrics:
+    def __init__(self, id_to_label):
+        self.is_begin, self.type_of, self.types = build_tag_tables(id_to_label)
+        self.reset()
+
+    def reset(self):
+        n_types = len(self.types)
+        self.true_positives = np.zeros(n_types, dtype=np.int64)
+        self.n_pred = np.zeros(n_types, dtype=np.int64)
+        self.n_true = np.zeros(n_types, dtype=np.int64)
+
+    def update(self, predictions, labels):
+        """predictions: logits (batch, seq, labels) or label ids (batch, seq); labels: (batch, seq) with -100 = ignore."""
+        predictions, labels = np.asarray(predictions), np.asarray(labels)
+        if predictions.ndim == 3:
+            predictions = predictions.argmax(axis=-1)
+        keep = labels != IGNORE_INDEX
+        if not keep.any():
+            return
+        # first kept position of every sentence (row) in the flattened arrays
+        kept_per_row = keep.sum(axis=1)
+        row_starts = np.cumsum(kept_per_row) - kept_per_row
+        sentence_start = row_starts[kept_per_row > 0]
+
+        true_keys, true_types = entity_keys(labels[keep], sentence_start, self.is_begin, self.type_of)
+        pred_keys, pred_types = entity_keys(predictions[keep], sentence_start, self.is_begin, self.type_of)
+        n_types = len(self.types)
+        hits = np.intersect1d(true_keys, pred_keys, assume_unique=True)
+        self.true_positives += np.bincount(hits % max(n_types, 1), minlength=n_types)[:n_types]
+        self.n_pred += np.bincount(pred_types, minlength=n_types)[:n_types]
+        self.n_true += np.bincount(true_types, minlength=n_types)[:n_types]
+
+    @staticmethod
+    def _prf(tp, n_pred, n_true):
+        # zero division -> 0.0, like seqeval's default
+        precision = np.divide(tp, n_pred, out=np.zeros(np.shape(tp), dtype=np.float64), where=np.asarray(n_pred) > 0)
+        recall = np.divide(tp, n_true, out=np.zeros(np.shape(tp), dtype=np.float64), where=np.asarray(n_true) > 0)
+        denom = precision + recall
+        f1 = np.divide(2 * precision * recall, denom, out=np.zeros(np.shape(tp), dtype=np.float64), where=denom > 0)
+        return precision, recall, f1
+
+    def report(self):
+        """Same layout as seqeval.metrics.classification_report(..., output_dict=True)."""
+        precision, recall, f1 = self._prf(self.true_positives, self.n_pred, self.n_true)
+        seen = (self.n_pred + self.n_true) > 0  # seqeval only lists types that occur in gold or predictions
+        report = {
+            name: {"precision": float(precision[i]), "recall": float(recall[i]), "f1-score": float(f1[i]),
+                   "support": int(self.n_true[i])}
+            for i, name in enumerate(self.types) if seen[i]
+        }
+        micro = self._prf(self.true_positives.sum(), self.n_pred.sum(), self.n_true.sum())
+        support = int(self.n_true[seen].sum())
+        report["micro avg"] = {"precision": float(micro[0]), "recall": float(micro[1]), "f1-score": float(micro[2]),
+                               "support": support}
+        weights = self.n_true[seen]
+        report["macro avg"] = {key: float(values[seen].mean()) if seen.any() else 0.0
+                               for key, values in (("precision", precision), ("recall", recall), ("f1-score", f1))}
+        report["weighted avg"] = {key: float(np.average(values[seen], weights=weights)) if weights.sum() else 0.0
+                                  for key, values in (("precision", precision), ("recall", recall), ("f1-score", f1))}
+        report["macro avg"]["support"] = report["weighted avg"]["support"] = support
+        return report
+
+    def compute(self):
+        """Flat dict of scalars for the Trainer: micro precision/recall/f1 plus per-type f1."""
+        report = self.report()
+        metrics = {
+            "precision": report["micro avg"]["precision"],
+            "recall": report["micro avg"]["recall"],
+            "f1": report["micro avg"]["f1-score"],
+        }
+        for name in self.types:
+            if name in report:
+                metrics[f"{name}_f1"] = report[name]["f1-score"]
+        return metrics
+
+    def __call__(self, eval_prediction, compute_result=True):
+        """Drop-in compute_metrics for the Trainer (works with and without batch_eval_metrics=True)."""
+        predictions, labels = eval_prediction
+        if hasattr(predictions, "detach"):  # batch_eval_metrics passes torch tensors
+            predictions, labels = predictions.detach().cpu().numpy(), labels.detach().cpu().numpy()
+        self.update(predictions, labels)
+        if not compute_result:
+            return {}
+        metrics = self.compute()
+        self.reset()
+        return metrics
+
+
+if __name__ == "__main__":
+    import time
+
+    from seqeval.metrics import classification_report  # type: ignore
+
+    custom_tags = ["O", "B-PERSON", "I-PERSON", "B-ORG", "I-ORG", "B-LOCATION", "I-LOCATION"]
+    id_to_label = {i: tag for i, tag in enumerate(custom_tags)}
+
+    # 50k random "sentences" of 40 tokens, 20% of positions ignored (-100) like subword continuations
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, len(custom_tags), size=(50_000, 40))
+    predictions = np.where(rng.random(labels.shape) < 0.8, labels, rng.integers(0, len(custom_tags), labels.shape))
+    labels[rng.random(labels.shape) < 0.2] = IGNORE_INDEX
+
+    start = time.perf_counter()
+    metrics = NERMetrics(id_to_label)
+    for b in range(0, len(labels), 512):  # streaming, one eval batch at a time
+        metrics.update(predictions[b:b + 512], labels[b:b + 512])
+    fast = metrics.report()
+    print(f"NERMetrics: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    true_labels = [[id_to_label[l] for l in label if l != -100] for label in labels]
+    true_predictions = [[id_to_label[p] for (p, l) in zip(prediction, label) if l != -100]
+                        for prediction, label in zip(predictions, labels)]
+    slow = classification_report(true_labels, true_predictions, output_dict=True)
+    print(f"seqeval:    {time.perf_counter() - start:.2f}s")
+
+    for name in fast:
+        for key in ("precision", "recall", "f1-score", "support"):
+            assert np.isclose(fast[name][key], slow[name][key]), (name, key, fast[name][key], slow[name][key])
+    print("Per-type precision / recall / F1 match seqeval.")
@@ -47,6 +47,7 @@ print(f"Tokens (no punctuation): {words_no_punct}")
 Read a sample SMS message.
 Remove stopwords, apply stemming.
 Output keywords for spam detection.'''
+# For many documents: text_preprocessor.py gives the same keywords with a compiled regex tokenizer, cached stems and a process pool
 sms = "Congratulations! You've won a free iPhone. Click here now."
 words = word_tokenize(sms)
 filtered = [stemmer.stem(w) for w in words if w.lower() not in stop_woords and w.isalpha()]
@@ -0,0 +1,170 @@
+'''Fast, Cached, Parallel Text Preprocessing
+nltk_preprocessing.py and preprocess_sentence() in summarizer.py run word_tokenize, a stopword check, PorterStemmer.stem and
+WordNetLemmatizer.lemmatize once per token. word_tokenize applies ~25 regex substitutions to every sentence, and the stemmer
+recomputes "running" -> "run" every single time the word shows up, although natural text repeats the same few thousand words.
+TextPreprocessor gives the same tokens and the same stems/lemmas, but tokenizes with one compiled regex,
+remembers stems and lemmas in a bounded LRU cache, and spreads chunks of documents over a multiprocessing pool.'''
+'''Key Concepts:
+Compiled regex tokenizer: a single findall() reproduces word_tokenize's splitting rules (punctuation, final period, "n't"/"'s" clitics,
+  "cannot" -> "can not", ...). Sentences with quote characters or unusual apostrophes take NLTK's own tokenizer, so results stay identical.
+LRU cache: functools.lru_cache(maxsize) around stem/lemmatize; Zipf's law means a small cache answers almost every call.
+Chunked multiprocessing: documents are sent to worker processes in chunks (one pickle round-trip per chunk, not per document);
+  each worker keeps its own cache. Output order = input order.'''
+import re
+import time
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import Pool
+
+from nltk.tokenize import sent_tokenize
+from nltk.tokenize.destructive import NLTKWordTokenizer
+
+TREEBANK = NLTKWordTokenizer()  # the tokenizer word_tokenize uses for every sentence
+
+# quote characters, apostrophes not between two word characters and runs like ",," or "---" are rare and
+# interact in subtle ways inside NLTK's rule cascade: such sentences are tokenized by NLTK itself
+UNSAFE_RE = re.compile(r"[\"`«»“”‘’„]|(?<!\w)'|'(?!\w)|[,:]{2}|-{3,}")
+FINAL_PERIOD_RE, FINAL_PERIOD_SUB = TREEBANK.PUNCTUATION[0]
+SPLIT_CHARS = r";@#$%&?!*\[\](){}<>‒-―"
+TOKEN_RE = re.compile(
+    rf"\.{{2,}}|--|[,:](?!\d)|[{SPLIT_CHARS}]"  # tokens of their own
+    rf"|(?:[^\s,:.\-{SPLIT_CHARS}]+|[,:](?=\d)|\.(?!\.)|-(?!-))+"  # everything else up to whitespace/split chars
+)
+CONTRACTION_RE = re.compile(r"'|(?i:cannot|gimme|gonna|gotta|lemme|wanna)")
+CLITIC_RULES = TREEBANK.ENDING_QUOTES[4:]  # "n't", "'s", "'ll", ...
+CONTRACTION_RULES = TREEBANK.CONTRACTIONS2 + TREEBANK.CONTRACTIONS3
+
+
+def split_contractions(token):
+    # NLTK's own clitic and contraction rules, applied to one token only
+    text = f" {token} "
+    for regexp, substitution in CLITIC_RULES:
+        text = regexp.sub(substitution, text)
+    for regexp in CONTRACTION_RULES:
+        text = regexp.sub(r" \1 \2 ", text)
+    return text.split()
+
+
+def tokenize_sentence(sentence):
+    """Same tokens as NLTKWordTokenizer().tokenize(sentence)."""
+    if UNSAFE_RE.search(sentence):
+        return TREEBANK.tokenize(sentence)
+    tokens = TOKEN_RE.findall(FINAL_PERIOD_RE.sub(FINAL_PERIOD_SUB, sentence))
+    if not CONTRACTION_RE.search(sentence):  # the common case: one findall and done
+        return tokens
+    return [part for token in tokens
+            for part in (split_contractions(token) if CONTRACTION_RE.search(token) else (token,))]
+
+
+def word_tokenize(text):
+    """Same tokens as nltk.word_tokenize(text): Punkt sentence split, then every sentence is tokenized."""
+    return [token for sentence in sent_tokenize(text) for token in tokenize_sentence(sentence)]
+
+
+class TextPreprocessor:
+    """Tokenize -> filter (alphabetic, stopwords) -> stem or lemmatize. Defaults match preprocess_sentence() in summarizer.py."""
+
+    def __init__(self, lowercase=True, alpha_only=True, stop_words=None, remove_stopwords=True, stem=False,
+                 lemmatize=False, cache_size=100_000, n_jobs=1, chunk_size=500):
+        if stop_words is None and remove_stopwords:
+            from nltk.corpus import stopwords
+            stop_words = stopwords.words("english")
+        self.lowercase = lowercase
+        self.alpha_only = alpha_only
+        self.stop_words = frozenset(stop_words) if remove_stopwords else frozenset()
+        self.stem = stem
+        self.lemmatize = lemmatize
+        self.cache_size = cache_size
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self._build_normalizer()
+
+    def _build_normalizer(self):
+        self._normalize = None
+        if self.stem:
+            from nltk.stem import PorterStemmer
+            self._normalize = lru_cache(maxsize=self.cache_size)(PorterStemmer().stem)
+        elif self.lemmatize:
+            from nltk.stem import WordNetLemmatizer
+            self._normalize = lru_cache(maxsize=self.cache_size)(WordNetLemmatizer().lemmatize)
+
+    # the lru_cache wrapper cannot be pickled: workers rebuild their own (empty) cache
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_normalize"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_normalizer()
+
+    def __call__(self, text):
+        """Tokens of one document (a list of str)."""
+        tokens = word_tokenize(text.lower() if self.lowercase else text)
+        stop_words = self.stop_words
+        words = [w for w in tokens if (not self.alpha_only or w.isalpha()) and w.lower() not in stop_words]
+        if self._normalize is not None:
+            normalize = self._normalize
+            words = [normalize(w) for w in words]
+        return words
+
+    def _process_chunk(self, texts):
+        return [self(text) for text in texts]
+
+    def process_many(self, texts):
+        """Tokens of many documents, in input order; n_jobs > 1 uses a process pool fed with chunks of documents."""
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, self.chunk_size)), [])
+        if self.n_jobs == 1:
+            return [words for chunk in chunks for words in self._process_chunk(chunk)]
+        with Pool(self.n_jobs) as pool:
+            return [words for result in pool.imap(self._process_chunk, chunks) for words in result]
+
+    def cache_info(self):
+        return self._normalize.cache_info() if self._normalize is not None else None
+
+
+def docs_per_second(process, docs):
+    start = time.perf_counter()
+    process(docs)
+    return len(docs) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    import os
+    import random
+
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import PorterStemmer
+
+    random.seed(0)
+    sentences = [
+        "NLTK makes NLP easy. Let's get started!",
+        "Congratulations! You've won a free iPhone. Click here now.",
+        "The Amazon River, which flows through the rainforest, is the largest river by discharge volume in the world.",
+        "Deforestation in the Amazon is a significant environmental concern; it contributes to climate change.",
+        "Runners were running (and easily winning) races that they can't forget, fairly.",
+        "Customer support is available from 9am to 5pm, and shipping costs $4.99 on orders under $50.",
+    ]
+    docs = [" ".join(random.choices(sentences, k=5)) for _ in range(5000)]
+
+    # current code: word_tokenize + stopword check + PorterStemmer.stem per token (like the spam keyword task)
+    stop_words = set(stopwords.words("english"))
+    stemmer = PorterStemmer()
+
+    def current(docs):
+        return [[stemmer.stem(w) for w in nltk.word_tokenize(d) if w.lower() not in stop_words and w.isalpha()]
+                for d in docs]
+
+    preprocessor = TextPreprocessor(lowercase=False, stem=True)
+    assert preprocessor.process_many(docs[:500]) == current(docs[:500])
+    print(f"current (word_tokenize + stem): {docs_per_second(current, docs):,.0f} docs/s")
+    print(f"TextPreprocessor, 1 process:    {docs_per_second(preprocessor.process_many, docs):,.0f} docs/s")
+    print(f"  stem cache: {preprocessor.cache_info()}")
+    parallel = TextPreprocessor(lowercase=False, stem=True, n_jobs=os.cpu_count())
+    print(f"TextPreprocessor, {os.cpu_count()} processes:   {docs_per_second(parallel.process_many, docs * 4):,.0f} docs/s")
+
+    # drop-in for preprocess_sentence() in summarizer.py
+    preprocess = TextPreprocessor()
+    print("\n" + " ".join(preprocess(sentences[2])))
@@ -0,0 +1,137 @@
+'''Fast HTML-to-Text Cleaning for Bulk Ingestion
+Task 2 in spacy_intro.py builds a full BeautifulSoup tree for every page just to call get_text(), and then runs two more
+regex passes over the result. For scraped pages that tree (one Python object per tag and per string) is most of the CPU time.
+HTMLTextExtractor streams through the page with the standard library's html.parser.HTMLParser, keeps only the text nodes,
+skips <script>/<style>/<template> blocks, and normalizes the joined text once. Directories of pages are cleaned by a process pool.'''
+'''Key Concepts:
+Streaming parser: HTMLParser calls handle_starttag / handle_data / handle_endtag while it reads; no tree is built.
+Skipped blocks: text inside script, style and template is not page text (BeautifulSoup's get_text() leaves it out too).
+One normalization pass: drop everything that is not a letter, digit or whitespace (one regex), then split()/join collapses
+  whitespace and strips the ends; lower() last. Same result as Task 2's two re.sub calls + lower + strip.
+Parallel directory cleaning: Pool.imap_unordered over file paths, many files per task (chunksize), one .txt written per page.'''
+import glob
+import os
+import re
+import time
+from html.parser import HTMLParser
+from multiprocessing import Pool
+
+NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9\s]+")
+SKIP_TAGS = frozenset({"script", "style", "template"})
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Collects the text nodes of a page, outside script/style/template. Reusable: call get_text() per page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)  # &amp; -> &, like get_text()
+        self._parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def unknown_decl(self, data):
+        if data.startswith("CDATA[") and not self._skip_depth:  # <![CDATA[...]]> is text for get_text() too
+            self._parts.append(data[6:])
+
+    def get_text(self, html):
+        self.reset()
+        self._parts, self._skip_depth = [], 0
+        self.feed(html)
+        self.close()
+        return "".join(self._parts)
+
+
+def normalize(text):
+    """Task 2 steps 2 and 3 in one pass: keep [a-zA-Z0-9] and whitespace, collapse whitespace, lowercase, strip."""
+    return " ".join(NON_ALNUM_RE.sub("", text).split()).lower()
+
+
+_extractor = None
+
+
+def clean_html(html):
+    global _extractor
+    if _extractor is None:  # one parser per process, reused for every page
+        _extractor = HTMLTextExtractor()
+    return normalize(_extractor.get_text(html))
+
+
+def _clean_file(paths):
+    in_path, out_path = paths
+    with open(in_path, encoding="utf-8", errors="replace") as f:
+        text = clean_html(f.read())
+    if out_path is not None:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return in_path, len(text)
+    return in_path, text
+
+
+def clean_directory(in_dir, out_dir=None, pattern="*.html", n_jobs=None, chunksize=64):
+    """Clean every matching file of in_dir in parallel. With out_dir, writes <name>.txt files and yields
+    (path, number of characters); without it, yields (path, cleaned text). Order follows completion, not input."""
+    paths = sorted(glob.glob(os.path.join(in_dir, pattern)))
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    jobs = [(path, None if out_dir is None else
+             os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")) for path in paths]
+    with Pool(n_jobs) as pool:
+        yield from pool.imap_unordered(_clean_file, jobs, chunksize=chunksize)
+
+
+def clean_html_bs4(html):
+    """Current Task 2 path, for comparison."""
+    from bs4 import BeautifulSoup
+    text_no_html = BeautifulSoup(html, "html.parser").get_text()
+    text_cleaned = re.sub(r'[^a-zA-Z0-9\s]', '', text_no_html)
+    return re.sub(r'\s+', ' ', text_cleaned).lower().strip()
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    text = '<div>Learn AI with <b>PyTorch</b> @ 2023! Visit <a href="#">our site</a>.</div>'
+    print(f"Cleaned: '{clean_html(text)}'")
+
+    # a synthetic scraped page: navigation, scripts, styles, entities and paragraphs
+    random.seed(0)
+    words = "learn ai with pytorch visit our site deep learning models data science news &amp; updates".split()
+    paragraphs = "".join(f"<p class='c{i}'>{' '.join(random.choices(words, k=40))} <b>bold</b> &copy; 2023!</p>\n"
+                         for i in range(30))
+    page = (f"<html><head><title>News</title><style>p {{color: red}}</style>"
+            f"<script>var x = '<p>not text</p>'; track();</script></head>"
+            f"<body><nav><a href='/'>Home</a> | <a href='/about'>About</a></nav>{paragraphs}</body></html>")
+    assert clean_html(page) == clean_html_bs4(page)
+
+    n = 300
+    start = time.perf_counter()
+    for _ in range(n):
+        clean_html_bs4(page)
+    bs4_rate = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(n):
+        clean_html(page)
+    fast_rate = n / (time.perf_counter() - start)
+    print(f"BeautifulSoup + 2 regex passes: {bs4_rate:.0f} pages/s")
+    print(f"HTMLTextExtractor + 1 pass:     {fast_rate:.0f} pages/s ({fast_rate / bs4_rate:.1f}x)")
+
+    # a directory of pages, cleaned in parallel
+    in_dir = tempfile.mkdtemp(prefix="pages-")
+    for i in range(2000):
+        with open(os.path.join(in_dir, f"page-{i:05d}.html"), "w", encoding="utf-8") as f:
+            f.write(page)
+    start = time.perf_counter()
+    n_files = sum(1 for _ in clean_directory(in_dir, os.path.join(in_dir, "text")))
+    print(f"Directory of {n_files} pages, {os.cpu_count()} processes: {n_files / (time.perf_counter() - start):.0f} pages/s")
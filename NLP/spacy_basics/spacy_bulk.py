@@ -0,0 +1,155 @@
+'''Bulk Entity / Lemma Extraction with spaCy
+spacy_intro.py calls nlp(text) for one string at a time, with the whole en_core_web_sm pipeline
+(tok2vec, tagger, parser, attribute_ruler, lemmatizer, ner) running even when only doc.ents is read.
+BulkExtractor turns on ONLY the components needed for the requested attributes, streams records through
+nlp.pipe in batches over several processes, and saves the processed Docs as DocBin shards, so downstream jobs
+load the annotations instead of parsing the same text again.'''
+'''Key Concepts:
+nlp.pipe(texts, batch_size, n_process): batches documents through every component (much less Python overhead per doc)
+  and can fork worker processes. as_tuples=True carries a record id along with every text.
+Component selection: "ents" needs only ner; "lemma" needs tagger + attribute_ruler + lemmatizer (the rule lemmatizer uses POS);
+  "dep" needs the parser, the most expensive component. Components that listen to a shared tok2vec keep it switched on.
+DocBin: compact binary container for many Docs; only the token attributes that were requested are stored.
+  Reading back: DocBin().from_disk(path).get_docs(nlp.vocab).'''
+import os
+import time
+
+import spacy
+from spacy.tokens import DocBin
+
+# attribute -> pipeline components that set it (only the ones present in the loaded pipeline are used)
+COMPONENTS_FOR = {
+    "ents": ["ner", "entity_ruler"],
+    "lemma": ["tagger", "attribute_ruler", "morphologizer", "lemmatizer"],
+    "pos": ["tagger", "attribute_ruler", "morphologizer"],
+    "tag": ["tagger"],
+    "morph": ["tagger", "attribute_ruler", "morphologizer"],
+    "dep": ["parser"],
+    "sents": ["parser", "sentencizer"],
+    "noun_chunks": ["parser", "tagger", "attribute_ruler"],
+}
+# token attributes that DocBin needs to restore each attribute (ORTH and SPACY are always stored)
+DOCBIN_ATTRS = {
+    "ents": ["ENT_IOB", "ENT_TYPE", "ENT_KB_ID"],
+    "lemma": ["LEMMA"],
+    "pos": ["POS"],
+    "tag": ["TAG"],
+    "morph": ["MORPH"],
+    "dep": ["HEAD", "DEP"],
+    "sents": ["SENT_START"],
+    "noun_chunks": ["HEAD", "DEP", "POS"],
+}
+EXTRACTORS = {
+    "ents": lambda doc: [{"text": e.text, "label": e.label_, "start": e.start_char, "end": e.end_char} for e in doc.ents],
+    "lemma": lambda doc: [t.lemma_ for t in doc],
+    "pos": lambda doc: [t.pos_ for t in doc],
+    "tag": lambda doc: [t.tag_ for t in doc],
+    "morph": lambda doc: [str(t.morph) for t in doc],
+    "dep": lambda doc: [(t.dep_, t.head.i) for t in doc],
+    "sents": lambda doc: [s.text for s in doc.sents],
+    "noun_chunks": lambda doc: [c.text for c in doc.noun_chunks],
+}
+
+
+def components_for(nlp, attrs):
+    """Names of the pipeline components needed to produce attrs."""
+    unknown = set(attrs) - set(COMPONENTS_FOR)
+    if unknown:
+        raise ValueError(f"Unknown attributes {sorted(unknown)}, choose from {sorted(COMPONENTS_FOR)}")
+    available = set(nlp.component_names)
+    needed = {name for attr in attrs for name in COMPONENTS_FOR[attr] if name in available}
+    if "sents" in attrs and "dep" not in attrs and "noun_chunks" not in attrs and "senter" in available:
+        # sentence boundaries alone: the small senter component is much cheaper than the parser
+        needed.discard("parser")
+        needed.add("senter")
+    # tagger/parser in the trained pipelines read their features from a shared tok2vec "listened" to
+    for name in nlp.component_names:
+        listeners = getattr(nlp.get_pipe(name), "listening_components", [])
+        if needed & set(listeners):
+            needed.add(name)
+    return [name for name in nlp.component_names if name in needed]
+
+
+class BulkExtractor:
+    def __init__(self, nlp, attrs=("ents",), batch_size=256, n_process=1, shard_size=10_000):
+        if isinstance(nlp, str):
+            nlp = spacy.load(nlp)
+        self.attrs = tuple(attrs)
+        self.enabled = components_for(nlp, self.attrs)
+        nlp.select_pipes(enable=self.enabled)  # everything else is skipped from now on
+        self.nlp = nlp
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.shard_size = shard_size
+        self.docbin_attrs = sorted({a for attr in self.attrs for a in DOCBIN_ATTRS[attr]})
+
+    def docs(self, records):
+        """records: iterable of (record_id, text). Yields Docs with doc.user_data["id"] set."""
+        texts = ((text, record_id) for record_id, text in records)
+        for doc, record_id in self.nlp.pipe(texts, as_tuples=True, batch_size=self.batch_size,
+                                            n_process=self.n_process):
+            doc.user_data["id"] = record_id
+            yield doc
+
+    def extract(self, records, out_dir=None):
+        """Yields {"id": ..., <attr>: ...} per record; with out_dir, the Docs are also written as DocBin shards."""
+        shard = self._new_docbin()
+        n_shards = 0
+        for doc in self.docs(records):
+            result = {"id": doc.user_data["id"]}
+            for attr in self.attrs:
+                result[attr] = EXTRACTORS[attr](doc)
+            if out_dir is not None:
+                shard.add(doc)
+                if len(shard) == self.shard_size:
+                    self._write_shard(shard, out_dir, n_shards)
+                    shard, n_shards = self._new_docbin(), n_shards + 1
+            yield result
+        if out_dir is not None and len(shard):
+            self._write_shard(shard, out_dir, n_shards)
+
+    def _new_docbin(self):
+        return DocBin(attrs=self.docbin_attrs, store_user_data=True)
+
+    def _write_shard(self, docbin, out_dir, index):
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"shard-{index:05d}.spacy")
+        docbin.to_disk(path + ".tmp")
+        os.replace(path + ".tmp", path)  # a shard is either complete or absent
+
+
+def read_shards(out_dir, vocab):
+    """Docs back from DocBin shards, without running any pipeline component."""
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith(".spacy"):
+            yield from DocBin().from_disk(os.path.join(out_dir, name)).get_docs(vocab)
+
+
+if __name__ == "__main__":
+    sentences = [
+        "Apple was founded by Steve Jobs in California in 1976.",
+        "Elon Musk launched a rocket from Texas.",
+        "Google opened a new office in London last March.",
+        "She eats apples.",
+    ]
+    records = [(i, sentences[i % len(sentences)]) for i in range(4000)]
+
+    nlp = spacy.load("en_core_web_sm")
+    start = time.perf_counter()
+    for _, text in records:
+        [ent.text for ent in nlp(text).ents]
+    print(f"nlp(text) one by one, full pipeline: {len(records) / (time.perf_counter() - start):.0f} docs/s")
+
+    extractor = BulkExtractor(spacy.load("en_core_web_sm"), attrs=("ents",), batch_size=256, n_process=2)
+    print(f"Components enabled for ents: {extractor.enabled}")
+    start = time.perf_counter()
+    results = list(extractor.extract(records, out_dir="spacy_shards"))
+    print(f"BulkExtractor (nlp.pipe, 2 processes): {len(records) / (time.perf_counter() - start):.0f} docs/s")
+    print(results[0])
+
+    lemmas = BulkExtractor(spacy.load("en_core_web_sm"), attrs=("ents", "lemma"))
+    print(f"\nComponents enabled for ents + lemma: {lemmas.enabled}")
+
+    # downstream job: annotations come back from disk, nothing is parsed again
+    doc = next(read_shards("spacy_shards", extractor.nlp.vocab))
+    print(doc.user_data["id"], [(ent.text, ent.label_) for ent in doc.ents])
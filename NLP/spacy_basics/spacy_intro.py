@@ -22,6 +22,7 @@ print([token.lemma_ for token in doc])
 
 # ------ Task -------
 '''Extract all person/entity names from "Elon Musk launched a rocket from Texas."'''
+# (for millions of records: spacy_bulk.py runs nlp.pipe with only the needed components and saves DocBin shards)
 doc = nlp("Elon Musk launched a rocket from Texas.")
 print([ent.text for ent in doc.ents if ent.label_ == "PERSON"])
 
@@ -47,4 +48,5 @@ print(f"Text after special char removal:",{text_cleaned})
 
 # 3. Convert to lowercase and clean extra spaces
 final_text = re.sub(r'\s+',' ',text_cleaned).lower().strip()
-print(f"Final Cleaned Text: '{final_text}")
\ No newline at end of file
+print(f"Final Cleaned Text: '{final_text}")
+# (many pages: html_cleaner.py gives the same text with a streaming parser, one normalization pass and a process pool)
\ No newline at end of file
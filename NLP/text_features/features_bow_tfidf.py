@@ -19,6 +19,7 @@ feature_names = vectorizer.get_feature_names_out()
 print(f"\nVocabulary: {feature_names}")
 
 # Convert sparse matrix to DataFrame for easy inspection
+# (.toarray() is fine for 3 documents; for a large corpus keep it sparse, see hashed_tfidf.py for an out-of-core version)
 df_bow = pd.DataFrame(bow_matrix.toarray(),columns=feature_names)
 print("--- Bag-of-Words Feature Matrix ---\n")
 print(df_bow)
@@ -0,0 +1,178 @@
+'''Out-of-Core TF-IDF with the Hashing Trick
+features_bow_tfidf.py and text_classification_ml.py call fit_transform on the whole corpus and then .toarray().
+fit_transform needs every document (and the full vocabulary dict) in memory, and .toarray() turns a matrix that is
+99.9% zeros into a dense one: 50M documents x 1M features would be 200 TB of float32.
+StreamingHashedTfidf never builds a vocabulary: every unigram/n-gram is hashed straight to a column. Sharded input files
+are processed in parallel, document frequencies are summed in the same single pass, and the result is written to disk
+as one sparse CSR file per input shard. Nothing is ever densified.'''
+'''Key Concepts:
+Hashing trick: column = hash(ngram) % n_features (sklearn HashingVectorizer). No fit, no vocabulary, constant memory;
+  rare collisions are the price. n_features = 2**20 or 2**22 is typical.
+Document frequency (DF): number of documents containing a column = np.bincount over the CSR column indices of every shard.
+Two cheap phases:
+  1. tokenize + hash every shard (in parallel), save raw counts as CSR, return its DF -> added into ONE df array as each shard finishes.
+  2. turn counts into TF-IDF with the global IDF: only a column scaling + row normalization of saved CSR files, no re-tokenizing.
+     Each counts file is deleted as soon as its TF-IDF file is written, so the intermediates do not double the disk use.
+IDF: ln((1 + n_docs) / (1 + df)) + 1, the same smoothed formula as TfidfVectorizer.
+Input shard: a text file (optionally .gz) with one document per line.'''
+import gzip
+import json
+import os
+import time
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+def open_text(path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+
+def make_hasher(n_features, ngram_range):
+    # raw counts (norm=None, no sign flipping) so DF and TF-IDF can be computed from them
+    return HashingVectorizer(n_features=n_features, ngram_range=ngram_range, alternate_sign=False, norm=None,
+                             dtype=np.float32)
+
+
+def count_shard(path, out_path, n_features, ngram_range, batch_size):
+    """Phase 1 worker: stream one input shard in batches, save its count matrix, return (n_docs, df)."""
+    hasher = make_hasher(n_features, ngram_range)
+    parts = []
+    with open_text(path) as f:
+        while True:
+            batch = [line.rstrip("\n") for line in islice(f, batch_size)]
+            if not batch:
+                break
+            parts.append(hasher.transform(batch))
+    counts = sp.vstack(parts, format="csr") if parts else sp.csr_matrix((0, n_features), dtype=np.float32)
+    sp.save_npz(out_path, counts, compressed=False)  # short-lived intermediate: skip the zlib pass
+    # HashingVectorizer sums duplicates, so every column appears at most once per row
+    return counts.shape[0], np.bincount(counts.indices, minlength=n_features)
+
+
+def _count_shard_job(args):
+    return count_shard(*args)
+
+
+def tfidf_shard(counts_path, out_path, idf, sublinear_tf, norm):
+    """Phase 2 worker: counts CSR -> TF-IDF CSR (column scaling + row normalization, stays sparse).
+    The counts file is removed once the TF-IDF file has been written."""
+    X = sp.load_npz(counts_path).tocsr()
+    if sublinear_tf:
+        np.log(X.data, out=X.data)
+        X.data += 1
+    X.data *= idf[X.indices]
+    if norm:
+        X = normalize(X, norm=norm, copy=False)
+    sp.save_npz(out_path, X)
+    os.remove(counts_path)
+    return X.shape[0]
+
+
+class StreamingHashedTfidf:
+    def __init__(self, n_features=2 ** 20, ngram_range=(1, 2), sublinear_tf=False, norm="l2", batch_size=10000,
+                 n_jobs=None):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs or os.cpu_count()
+        self.df = None
+        self.n_docs = 0
+
+    @property
+    def idf(self):
+        return (np.log((1 + self.n_docs) / (1 + self.df)) + 1).astype(np.float32)
+
+    def fit_transform_shards(self, input_paths, out_dir):
+        """Hash and count every input shard in parallel, then write one TF-IDF CSR file per shard to out_dir.
+        Returns the list of TF-IDF shard paths, in input order."""
+        os.makedirs(out_dir, exist_ok=True)
+        names = [f"{i:05d}" for i in range(len(input_paths))]
+        count_paths = [os.path.join(out_dir, f"counts-{name}.npz") for name in names]
+        tfidf_paths = [os.path.join(out_dir, f"tfidf-{name}.npz") for name in names]
+
+        with Pool(self.n_jobs) as pool:
+            # phase 1: one streaming pass over the raw text; each shard's DF vector is added in as soon as it arrives,
+            # so the parent holds one df array however many shards there are
+            self.n_docs, self.df = 0, np.zeros(self.n_features, dtype=np.int64)
+            jobs = [(path, out, self.n_features, self.ngram_range, self.batch_size)
+                    for path, out in zip(input_paths, count_paths)]
+            for n_docs, df in pool.imap_unordered(_count_shard_job, jobs):
+                self.n_docs += n_docs
+                self.df += df
+            # phase 2: rescale the saved count shards with the global IDF
+            pool.starmap(partial(tfidf_shard, idf=self.idf, sublinear_tf=self.sublinear_tf, norm=self.norm),
+                         zip(count_paths, tfidf_paths))
+        self.save(out_dir)
+        return tfidf_paths
+
+    def transform(self, documents):
+        """TF-IDF rows for new documents (e.g. at prediction time), using the corpus IDF."""
+        X = make_hasher(self.n_features, self.ngram_range).transform(documents).tocsr()
+        if self.sublinear_tf:
+            np.log(X.data, out=X.data)
+            X.data += 1
+        X.data *= self.idf[X.indices]
+        return normalize(X, norm=self.norm, copy=False) if self.norm else X
+
+    def save(self, out_dir):
+        np.save(os.path.join(out_dir, "df.npy"), self.df)
+        with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"n_features": self.n_features, "ngram_range": list(self.ngram_range),
+                       "sublinear_tf": self.sublinear_tf, "norm": self.norm, "n_docs": self.n_docs}, f)
+
+    @classmethod
+    def load(cls, out_dir):
+        with open(os.path.join(out_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectorizer = cls(meta["n_features"], meta["ngram_range"], meta["sublinear_tf"], meta["norm"])
+        vectorizer.n_docs = meta["n_docs"]
+        vectorizer.df = np.load(os.path.join(out_dir, "df.npy"))
+        return vectorizer
+
+
+def iter_shards(paths):
+    """Stream the CSR shards back one at a time (e.g. for SGDClassifier.partial_fit)."""
+    for path in paths:
+        yield sp.load_npz(path).tocsr()
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    # synthetic corpus: 8 shards x 25,000 short reviews
+    random.seed(0)
+    words = ("cats dogs are great pets loyal animals independent creatures love sunny weather clear skies rainy "
+             "makes me sad but sky cheers up free prize click now study exam coffee laptop workshop").split()
+    data_dir = tempfile.mkdtemp(prefix="corpus-")
+    input_paths = []
+    for shard in range(8):
+        path = os.path.join(data_dir, f"shard-{shard}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(25_000):
+                f.write(" ".join(random.choices(words, k=random.randint(5, 30))) + "\n")
+        input_paths.append(path)
+
+    vectorizer = StreamingHashedTfidf(n_features=2 ** 20, ngram_range=(1, 2))
+    start = time.perf_counter()
+    shard_paths = vectorizer.fit_transform_shards(input_paths, os.path.join(data_dir, "features"))
+    print(f"{vectorizer.n_docs} documents -> {len(shard_paths)} TF-IDF shards in {time.perf_counter() - start:.1f}s")
+
+    total_nnz = total_bytes = 0
+    for X in iter_shards(shard_paths):
+        total_nnz += X.nnz
+        total_bytes += X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    dense_bytes = vectorizer.n_docs * vectorizer.n_features * 4
+    print(f"non-zeros: {total_nnz:,}, sparse size {total_bytes / 1e6:.0f} MB vs dense {dense_bytes / 1e9:.0f} GB")
+
+    # new documents at prediction time: same columns, same IDF, still sparse
+    X_new = StreamingHashedTfidf.load(os.path.join(data_dir, "features")).transform(["Cats and dogs are great pets."])
+    print(f"new document: {X_new.nnz} non-zero features of {X_new.shape[1]:,}")
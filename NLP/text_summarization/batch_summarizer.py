@@ -0,0 +1,128 @@
+'''Batched Abstractive Summarization
+The abstractive example in summarizer.py encodes one article and calls model.generate with num_beams=4 for that article alone.
+For a nightly backlog of documents that means thousands of tiny generate calls, each paying the full per-step overhead of the decoder.
+BatchSummarizer reads a stream of articles, tokenizes them once, sorts them by token length into buckets and runs generate on padded batches.'''
+'''Key Concepts:
+Length-sorted buckets: articles of similar length go into the same batch, so little compute is spent on padding.
+KV cache (use_cache=True): the decoder keeps the keys/values of already generated tokens and of the encoder output, so each step only processes the newest token.
+Modes, one API:
+  greedy      - num_beams=1, fastest.
+  beam        - num_beams=4, best quality, slowest.
+  early-exit  - beam search that stops as soon as num_beams finished hypotheses exist (early_stopping=True),
+                with a generation budget that shrinks for short inputs.
+Streaming: articles are read in chunks (read_ahead) and summaries are yielded in input order.'''
+import json
+import time
+from itertools import islice
+
+import torch
+
+MODES = {
+    "greedy": {"num_beams": 1, "do_sample": False},
+    "beam": {"num_beams": 4, "do_sample": False, "early_stopping": False},
+    "early-exit": {"num_beams": 4, "do_sample": False, "early_stopping": True},
+}
+
+
+class BatchSummarizer:
+    def __init__(self, model, tokenizer, prefix="summarize: ", batch_size=16, max_input_length=512,
+                 max_new_tokens=50, min_length=15, read_ahead=256, device=None):
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.model = model.to(self.device).eval()
+        self.tokenizer = tokenizer
+        self.prefix = prefix  # T5 expects "summarize: ", BART/Pegasus do not need a prefix
+        self.batch_size = batch_size
+        self.max_input_length = max_input_length
+        self.max_new_tokens = max_new_tokens
+        self.min_length = min_length
+        self.read_ahead = read_ahead
+
+    def summarize(self, articles, mode="early-exit"):
+        """articles: iterable of strings. Yields one summary per article, in input order."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, choose from {sorted(MODES)}")
+        articles = iter(articles)
+        while True:
+            chunk = list(islice(articles, self.read_ahead))
+            if not chunk:
+                return
+            yield from self._summarize_chunk(chunk, mode)
+
+    def cache_fingerprint(self, mode="early-exit"):
+        """Everything that decides the summary of a given text: model/tokenizer identity, prefix, truncation and
+        generation settings. Use it in cache keys, so changing any of them never returns a stale summary."""
+        config = self.model.config
+        return json.dumps({
+            "model": config.name_or_path, "model_class": type(self.model).__name__,
+            "revision": getattr(config, "_commit_hash", None), "tokenizer": self.tokenizer.name_or_path,
+            "prefix": self.prefix, "max_input_length": self.max_input_length, "max_new_tokens": self.max_new_tokens,
+            "min_length": self.min_length, "mode": mode, "mode_kwargs": MODES[mode],
+            "generation_config": self.model.generation_config.to_dict(),
+        }, sort_keys=True, default=str)
+
+    def _generation_kwargs(self, mode, longest_input):
+        kwargs = dict(MODES[mode], use_cache=True, min_length=self.min_length)
+        max_new_tokens = self.max_new_tokens
+        if mode == "early-exit":
+            # a summary rarely needs more tokens than half of its input
+            max_new_tokens = max(self.min_length + 1, min(max_new_tokens, longest_input // 2))
+        kwargs["max_new_tokens"] = max_new_tokens
+        return kwargs
+
+    def _summarize_chunk(self, chunk, mode):
+        encoded = self.tokenizer([self.prefix + article for article in chunk], truncation=True,
+                                 max_length=self.max_input_length)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(chunk)), key=lengths.__getitem__)
+        summaries = [None] * len(chunk)
+
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            batch = self.tokenizer.pad(
+                {"input_ids": [encoded["input_ids"][r] for r in rows],
+                 "attention_mask": [encoded["attention_mask"][r] for r in rows]},
+                return_tensors="pt",
+            ).to(self.device)
+            with torch.inference_mode():
+                summary_ids = self.model.generate(
+                    **batch, **self._generation_kwargs(mode, max(lengths[r] for r in rows))
+                )
+            for r, summary in zip(rows, self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)):
+                summaries[r] = summary
+        return summaries
+
+
+def summaries_per_second(summarizer, articles, mode):
+    start = time.perf_counter()
+    n = sum(1 for _ in summarizer.summarize(articles, mode=mode))
+    return n / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    model_name = "t5-small"
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    summarizer = BatchSummarizer(model, tokenizer, device="cpu")
+
+    articles = [
+        "Artificial intelligence has been a field of study for decades, but recent advancements in machine learning "
+        "and deep learning have propelled it into mainstream applications such as chatbots and translation services.",
+        "The Amazon rainforest is the largest tropical rainforest in the world. Deforestation in the Amazon is a "
+        "significant environmental concern, it contributes to climate change and threatens biodiversity.",
+        "The company announced record profits in the last quarter, exceeding all analyst expectations.",
+    ] * 16
+
+    # baseline: one article per generate call, like summarizer.py
+    start = time.perf_counter()
+    for article in articles:
+        inputs = tokenizer("summarize: " + article, return_tensors="pt", max_length=512, truncation=True)
+        with torch.inference_mode():
+            model.generate(**inputs, num_beams=4, max_new_tokens=50, min_length=15, early_stopping=True)
+    print(f"One article per call (beam=4): {len(articles) / (time.perf_counter() - start):.2f} summaries/s")
+
+    for mode in MODES:
+        print(f"BatchSummarizer {mode:<11}: {summaries_per_second(summarizer, articles, mode):.2f} summaries/s")
+
+    print(f"\nExample: {next(summarizer.summarize(articles[:1], mode='greedy'))}")
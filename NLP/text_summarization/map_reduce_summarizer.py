@@ -0,0 +1,180 @@
+'''Hierarchical Map-Reduce Summarization for Long Documents
+summarizer.py truncates the input at 512 tokens, so everything after the first page of a long report never reaches the summary.
+Map-reduce summarization splits the document into chunks that fit the model window (cutting only at sentence boundaries),
+summarizes all chunks in batches (map), joins the chunk summaries and summarizes that again (reduce), recursively, until it fits.
+Chunk summaries are cached by content hash, so re-summarizing an edited document only recomputes the chunks that actually changed.'''
+'''Key Concepts:
+Content-defined chunking: chunks of whole sentences, at most chunk_tokens tokens; a chunk ends after a sentence whose hash says "cut here"
+  (like rsync/dedup chunkers do with bytes), so an edit near the top does not shift every later boundary. A sentence is only split if it alone is too long.
+Map step: chunks of ALL documents at the same level go through BatchSummarizer together, so batches stay full.
+Reduce step: concatenated summaries become the next level's input; stop when they fit in one window.
+Content-hash cache: key = sha256(summarizer fingerprint, chunk text); the fingerprint (BatchSummarizer.cache_fingerprint) covers the model,
+  tokenizer, prefix, mode and every generation setting. Stored in SQLite, so it survives restarts and can be shared.'''
+import hashlib
+import sqlite3
+
+from nltk.tokenize import sent_tokenize
+
+
+class SummaryCache:
+    """Chunk summaries in SQLite, keyed by a hash of (summarizer fingerprint, chunk text)."""
+
+    def __init__(self, db_path="summary_cache.db"):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("create table if not exists summaries (key text primary key, summary text)")
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(fingerprint, text):
+        return hashlib.sha256(f"{fingerprint}\x1f{text}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):  # stay below SQLite's host-parameter limit
+            part = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"select key, summary from summaries where key in ({','.join('?' * len(part))})", part
+            ).fetchall()
+            found.update(rows)
+        self.hits += sum(k in found for k in keys)
+        self.misses += sum(k not in found for k in keys)
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany("insert or replace into summaries (key, summary) values (?, ?)", items)
+        self.conn.commit()
+
+
+def is_cut_point(sentence, n_tokens, target_tokens):
+    """Content-defined boundary: depends only on the sentence itself, never on its position in the document.
+    A cut follows a sentence with probability n_tokens / target_tokens, so chunks average ~target_tokens tokens."""
+    h = int.from_bytes(hashlib.blake2b(sentence.encode(), digest_size=8).digest(), "big")
+    return h < (n_tokens / target_tokens) * 2 ** 64
+
+
+def chunk_sentences(text, tokenizer, chunk_tokens, min_tokens=None, target_tokens=None, split_sentences=sent_tokenize):
+    """Split text into chunks of whole sentences with at most chunk_tokens tokens each.
+    Chunk boundaries are content-defined: after a sentence whose hash marks it as a cut point (once the chunk has
+    min_tokens tokens), or when the next sentence would overflow chunk_tokens. Inserting or editing a sentence therefore
+    changes only the chunk(s) around it; the boundaries after it stay where they were, so their cached summaries are reused."""
+    min_tokens = chunk_tokens // 4 if min_tokens is None else min_tokens
+    target_tokens = target_tokens or chunk_tokens // 2
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    token_ids = tokenizer(sentences, add_special_tokens=False)["input_ids"]  # one call for all sentences
+    chunks, current, current_len = [], [], 0
+    for i, (sentence, ids) in enumerate(zip(sentences, token_ids)):
+        if len(ids) > chunk_tokens:
+            # a single sentence longer than the window: flush, then cut it into window-sized pieces
+            if current:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            for start in range(0, len(ids), chunk_tokens):
+                chunks.append(tokenizer.decode(ids[start:start + chunk_tokens]))
+            continue
+        current.append(sentence)
+        current_len += len(ids)
+        next_len = len(token_ids[i + 1]) if i + 1 < len(sentences) else 0
+        if current_len + next_len > chunk_tokens or (
+                current_len >= min_tokens and is_cut_point(sentence, len(ids), target_tokens)):
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class MapReduceSummarizer:
+    def __init__(self, batch_summarizer, cache=None, mode="early-exit", chunk_tokens=None, max_levels=5):
+        self.summarizer = batch_summarizer
+        self.tokenizer = batch_summarizer.tokenizer
+        self.cache = cache
+        self.mode = mode
+        # leave room for the prefix and special tokens inside the model window
+        overhead = len(self.tokenizer(batch_summarizer.prefix)["input_ids"])
+        self.chunk_tokens = chunk_tokens or batch_summarizer.max_input_length - overhead
+        self.max_levels = max_levels
+
+    def _summarize_chunks(self, chunks):
+        """Summaries for a list of chunk texts, using the cache and batching only the misses."""
+        if self.cache is None:
+            return list(self.summarizer.summarize(chunks, mode=self.mode))
+        fingerprint = self.summarizer.cache_fingerprint(self.mode)  # read per call: settings may change between runs
+        keys = [SummaryCache.key(fingerprint, chunk) for chunk in chunks]
+        cached = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(k for k in keys if k not in cached))
+        if missing:
+            text_of = dict(zip(keys, chunks))
+            new = list(self.summarizer.summarize([text_of[k] for k in missing], mode=self.mode))
+            self.cache.put_many(list(zip(missing, new)))
+            cached.update(zip(missing, new))
+        return [cached[k] for k in keys]
+
+    def summarize_many(self, documents):
+        """Summarize documents of any length; all documents advance level by level together."""
+        texts = list(documents)
+        finished = [None] * len(texts)
+        active = list(range(len(texts)))
+
+        for level in range(self.max_levels):
+            if not active:
+                break
+            # map: chunk every active document, summarize all chunks of this level in one batched pass
+            doc_chunks = [chunk_sentences(texts[d], self.tokenizer, self.chunk_tokens) for d in active]
+            summaries = iter(self._summarize_chunks([c for chunks in doc_chunks for c in chunks]))
+
+            still_active = []
+            for d, chunks in zip(active, doc_chunks):
+                joined = " ".join(next(summaries) for _ in chunks)
+                # reduce: a single chunk means the summary covers the whole (remaining) document
+                if len(chunks) <= 1 or level == self.max_levels - 1:
+                    finished[d] = joined
+                else:
+                    texts[d] = joined
+                    still_active.append(d)
+            active = still_active
+        return finished
+
+    def summarize(self, document):
+        return self.summarize_many([document])[0]
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    from batch_summarizer import BatchSummarizer
+
+    model_name = "t5-small"
+    batch_summarizer = BatchSummarizer(AutoModelForSeq2SeqLM.from_pretrained(model_name),
+                                       AutoTokenizer.from_pretrained(model_name))
+    summarizer = MapReduceSummarizer(batch_summarizer, cache=SummaryCache("summary_cache.db"))
+
+    paragraphs = [
+        "The Amazon rainforest is the largest tropical rainforest in the world. It spans nine countries in South America.",
+        "Deforestation in the Amazon is a significant environmental concern. It contributes to climate change.",
+        "Efforts are underway by international organizations and local governments to protect this vital ecosystem.",
+    ]
+    # several thousand tokens, far past the 512-token window
+    long_report = " ".join(f"Section {i}: {paragraph}" for i in range(60) for paragraph in paragraphs)
+    print(f"Report: {len(summarizer.tokenizer(long_report)['input_ids'])} tokens")
+    print(f"\nSummary: {summarizer.summarize(long_report)}")
+
+    # edit a sentence near the top: the chunk boundaries after it do not move, so only 1-2 chunks are new
+    edited = long_report.replace("It spans nine countries", "It stretches across nine countries", 1)
+    before = chunk_sentences(long_report, summarizer.tokenizer, summarizer.chunk_tokens)
+    after = chunk_sentences(edited, summarizer.tokenizer, summarizer.chunk_tokens)
+    changed = [chunk for chunk in after if chunk not in set(before)]
+    assert 1 <= len(changed) <= 2, f"{len(changed)} of {len(after)} chunks changed after an edit in the first sentences"
+    summarizer.cache.hits = summarizer.cache.misses = 0
+    summarizer.summarize(edited)
+    print(f"\nAfter edit: {len(changed)} of {len(after)} chunks changed; {summarizer.cache.hits} cached summaries reused, "
+          f"{summarizer.cache.misses} recomputed (changed chunks + the short reduce levels above them)")
+
+    # a different generation setting is a different cache key: nothing stale is returned
+    batch_summarizer.max_new_tokens = 80
+    summarizer.cache.hits = 0
+    summarizer.summarize(edited)
+    assert summarizer.cache.hits == 0, "summaries cached with max_new_tokens=50 were reused for max_new_tokens=80"
+    print("After changing max_new_tokens: 0 cached summaries reused")
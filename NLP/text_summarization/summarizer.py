@@ -41,7 +41,9 @@ policymakers, and the public.
 # 4. Prepare Input for the Model
 # T5 models typically expect a prefix like "summarize: "
 input_text = "summarize: " + article
-inputs = tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True)
+# max_length=512: anything after the first ~512 tokens is cut off. For long reports use map_reduce_summarizer.py.
+# tokenizer(...) returns a dict-like BatchEncoding (input_ids + attention_mask); tokenizer.encode would return a bare tensor
+inputs = tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
 # Move inputs to the same device as the model
 inputs = {key: val.to(device) for key, val in inputs.items()}
 # 5. Generate Summary
@@ -52,12 +54,16 @@ with torch.no_grad():
     # `max_new_tokens`: Max length of the generated summary.
     summary_ids = model.generate(
         inputs["input_ids"],
+        attention_mask=inputs["attention_mask"],
         num_beams=4, # Beam search for better quality
         max_new_tokens=50, # Max tokens for the summary
         min_length=15,
         early_stopping=True # Stop when all beam hypotheses have finished
     )
 
+# For many articles, batch_summarizer.py sorts them by length and runs generate on padded batches
+# (greedy / beam / early-exit modes under one API).
+
 # 6. Decode and Print Summary
 summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
 
@@ -96,6 +102,7 @@ Efforts are underway by international organizations and local governments to pro
 # 2. Preprocessing & Sentence Tokenization
 # Simple preprocessing (lowercase, remove punctuation, remove stopwords)
 stop_words_english = set(stopwords.words('english'))
+# (same output, faster for many sentences: TextPreprocessor() in ../nltk_basics/text_preprocessor.py)
 def preprocess_sentence(sentence):
     return ' '.join([
         word for word in word_tokenize(sentence.lower())
@@ -109,6 +116,7 @@ preprocessed_sentences = [preprocess_sentence(s) for s in filtered_sentences]
 
 # 3. TF-IDF Vectorization for sentences
 # Each sentence becomes a "document" for TF-IDF
+# (a new vectorizer per document; textrank_summarizer.py reuses a corpus IDF and ranks sentences with sparse TextRank + MMR)
 vectorizer = TfidfVectorizer()
 sentence_vectors = vectorizer.fit_transform(preprocessed_sentences)
 
@@ -0,0 +1,227 @@
+'''Scalable Extractive Summarization: TextRank on a Sparse Similarity Graph + MMR
+The extractive part of summarizer.py fits a brand-new TfidfVectorizer on every document, runs word_tokenize twice per sentence,
+and scores sentences only against the document centroid (so five sentences saying the same thing all rank high).
+TextRankSummarizer tokenizes every sentence once, reuses an IDF fitted offline on a whole corpus, connects each sentence only to its
+top-k most similar sentences (sparse graph), ranks sentences with TextRank (PageRank by power iteration on the sparse matrix),
+and picks the summary with MMR so that near-duplicate sentences are not selected twice. Many documents are handled in one call.'''
+'''Key Concepts:
+Corpus-level IDF: fit_idf() learns word rarity once, offline; every document afterwards is only transform()-ed.
+Sparse top-k graph: a 10k-sentence document has 100M sentence pairs; keeping the k best neighbours per sentence keeps the graph O(n*k).
+  Only pairs that share a word are scored (sparse X @ X.T); the most common words are dropped from it when it would grow too large.
+TextRank: a sentence is important if it is similar to other important sentences. r = (1-d)/n + d * P^T r, repeated until r stops changing.
+Block-diagonal batching: graphs of many documents are stacked into one sparse matrix, so one power iteration ranks all documents at once.
+MMR (Maximal Marginal Relevance): next sentence = argmax  lambda * rank - (1 - lambda) * (max similarity to already selected sentences).'''
+import pickle
+import re
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def identity_analyzer(tokens):
+    # the vectorizer receives already tokenized sentences (module-level function so the vectorizer can be pickled)
+    return tokens
+
+
+def default_stopwords():
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+
+def default_sentence_splitter(text):
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize(text)
+
+
+def tokenize_sentence(sentence, stop_words):
+    """One regex pass: (number of tokens, content words). Content words = alphabetic, lowercased, not a stopword."""
+    tokens = TOKEN_RE.findall(sentence)
+    words = [t for t in (tok.lower() for tok in tokens) if t.isalpha() and t not in stop_words]
+    return len(tokens), words
+
+
+def fit_idf(corpus_sentences, stop_words=None, min_df=2):
+    """Fit the IDF once on a large corpus (iterable of sentences). Save it with save_vectorizer and reuse it."""
+    stop_words = default_stopwords() if stop_words is None else stop_words
+    vectorizer = TfidfVectorizer(analyzer=identity_analyzer, min_df=min_df, sublinear_tf=True, dtype=np.float32)
+    vectorizer.fit(tokenize_sentence(s, stop_words)[1] for s in corpus_sentences)
+    return vectorizer
+
+
+def save_vectorizer(vectorizer, path):
+    with open(path, "wb") as f:
+        pickle.dump(vectorizer, f)
+
+
+def load_vectorizer(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def topk_similarity_graph(X, k=10, max_pairs=2 ** 22):
+    """Symmetric sparse graph keeping the k most similar neighbours of every row of X (rows L2-normalized).
+    Similarities come from one sparse X @ X.T, never densified. Its size is the sum of df^2 over the words (df = number of
+    sentences containing the word), dominated by the most common words; if it would exceed max_pairs, those words
+    (lowest IDF within the document) are left out of the similarity until it fits. Rare words decide the neighbours anyway."""
+    n = X.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return sp.csr_matrix((n, n), dtype=np.float32)
+    X = X[:, np.unique(X.indices)].tocsr()  # only the words of this document
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    by_df = np.argsort(df, kind="stable")
+    fits = np.cumsum(df[by_df].astype(np.int64) ** 2) <= max_pairs
+    keep = np.zeros(X.shape[1], dtype=bool)
+    keep[by_df[fits]] = True
+    keep &= df > 1  # a word of a single sentence links no pair
+    X = X[:, keep].tocsr()
+
+    S = (X @ X.T).tocsr()
+    S.setdiag(0)  # no self loops
+    S.eliminate_zeros()
+    rows = np.repeat(np.arange(n), np.diff(S.indptr))
+    # k best per row: one sort by (row, -similarity); similarities are in (0, 1], so row - sim / 2 orders both at once
+    order = np.argsort(rows - 0.5 * S.data.astype(np.float64))
+    rows, cols, vals = rows[order], S.indices[order], S.data[order]
+    rank = np.arange(len(rows)) - S.indptr[rows]
+    best = rank < k
+    W = sp.csr_matrix((vals[best], (rows[best], cols[best])), shape=(n, n))
+    return W.maximum(W.T).tocsr()
+
+
+def textrank(W, group_sizes, damping=0.85, tol=1e-6, max_iter=100):
+    """Power iteration on a (block-diagonal) weighted graph. group_sizes: number of sentences per document;
+    the teleport term and dangling nodes are handled per document, so scores of each document sum to 1."""
+    n = W.shape[0]
+    group = np.repeat(np.arange(len(group_sizes)), group_sizes)
+    sizes = np.asarray(group_sizes, dtype=np.float64)[group]
+    out_weight = np.asarray(W.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv_out = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    PT = (sp.diags(inv_out) @ W).T.tocsr()
+
+    r = 1.0 / sizes
+    for _ in range(max_iter):
+        # rank held by dangling sentences is spread evenly over their own document
+        dangling_mass = np.bincount(group, weights=r * dangling, minlength=len(group_sizes))[group]
+        new_r = (1 - damping) / sizes + damping * (PT @ r + dangling_mass / sizes)
+        if np.abs(new_r - r).sum() < tol:
+            return new_r
+        r = new_r
+    return r
+
+
+def mmr_select(X, scores, n_select, diversity=0.3):
+    """Greedy MMR over the rows of X (one document). Returns selected row indices in document order."""
+    n = X.shape[0]
+    n_select = min(n_select, n)
+    relevance = scores / scores.max() if n and scores.max() > 0 else scores
+    max_sim = np.zeros(n)
+    selected = []
+    available = np.ones(n, dtype=bool)
+    for _ in range(n_select):
+        mmr = (1 - diversity) * relevance - diversity * max_sim
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        max_sim = np.maximum(max_sim, (X @ X[best].T).toarray().ravel())  # one sparse mat-vec per pick
+    return sorted(selected)
+
+
+class TextRankSummarizer:
+    def __init__(self, vectorizer, stop_words=None, split_sentences=None, top_k=10, damping=0.85,
+                 diversity=0.3, min_tokens=6):
+        self.vectorizer = vectorizer
+        self.stop_words = default_stopwords() if stop_words is None else stop_words
+        self.split_sentences = split_sentences or default_sentence_splitter
+        self.top_k = top_k
+        self.damping = damping
+        self.diversity = diversity
+        self.min_tokens = min_tokens  # like the "len(word_tokenize(s)) > 5" filter in summarizer.py
+
+    def summarize_many(self, documents, n_sentences=3):
+        """Extractive summaries (lists of sentences, in document order) for many documents in one call."""
+        doc_sentences, doc_words = [], []
+        for text in documents:
+            kept, words = [], []
+            for sentence in self.split_sentences(text):
+                n_tokens, content = tokenize_sentence(sentence, self.stop_words)  # tokenized exactly once
+                if n_tokens >= self.min_tokens:
+                    kept.append(sentence)
+                    words.append(content)
+            doc_sentences.append(kept)
+            doc_words.append(words)
+
+        sizes = [len(s) for s in doc_sentences]
+        if not sum(sizes):
+            return [[] for _ in doc_sentences]
+        X = self.vectorizer.transform(w for words in doc_words for w in words).tocsr()  # one transform call
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        # documents without usable sentences have no rows in X, so they are simply left out of the graph
+        nonempty = [d for d, size in enumerate(sizes) if size]
+        graphs = [topk_similarity_graph(X[bounds[d]:bounds[d + 1]], self.top_k) for d in nonempty]
+        scores = textrank(sp.block_diag(graphs, format="csr"), [sizes[d] for d in nonempty], self.damping)
+
+        summaries = []
+        for d, sentences in enumerate(doc_sentences):
+            if not sentences:
+                summaries.append([])
+                continue
+            rows = slice(bounds[d], bounds[d + 1])
+            picked = mmr_select(X[rows], scores[rows], n_sentences, self.diversity)
+            summaries.append([sentences[i] for i in picked])
+        return summaries
+
+    def summarize(self, document, n_sentences=3):
+        return self.summarize_many([document], n_sentences)[0]
+
+
+if __name__ == "__main__":
+    import time
+
+    article_extractive = """
+    The Amazon rainforest is the largest tropical rainforest in the world.
+    It covers an area of approximately 6.7 million square kilometers
+    (2.6 million square miles), spanning nine countries in South America:
+    Brazil, Peru, Colombia, Ecuador, Bolivia, Guyana, Suriname, French Guiana, and Venezuela.
+    The Amazon River, which flows through the rainforest, is the largest river by discharge volume in the world.
+    Deforestation in the Amazon is a significant environmental concern.
+    It contributes to climate change and threatens biodiversity.
+    Efforts are underway by international organizations and local governments to protect this vital ecosystem.
+    """
+
+    # offline step: fit the IDF on a corpus once and save it (here: a small synthetic corpus)
+    corpus = default_sentence_splitter(article_extractive) * 50
+    vectorizer = fit_idf(corpus, min_df=1)
+    save_vectorizer(vectorizer, "textrank_idf.pkl")
+
+    summarizer = TextRankSummarizer(load_vectorizer("textrank_idf.pkl"))
+    print("Extractive summary (TextRank + MMR):")
+    print("\n".join(summarizer.summarize(article_extractive, n_sentences=3)))
+
+    # scale test: 10k-sentence documents over a realistic vocabulary (30k word types with Zipf frequencies, 20 words per sentence)
+    rng = np.random.default_rng(0)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    vocab = np.array(["".join(rng.choice(letters, size=rng.integers(4, 10))) for _ in range(30_000)])
+    zipf = 1.0 / np.arange(1, len(vocab) + 1)
+    zipf /= zipf.sum()
+
+    def make_doc(n_sentences):
+        words = vocab[rng.choice(len(vocab), size=(n_sentences, 20), p=zipf)]
+        return " ".join(" ".join(sentence) + "." for sentence in words)
+
+    splitter = lambda text: [s for s in text.split(".") if s.strip()]  # simple splitter for the synthetic text
+    fast = TextRankSummarizer(fit_idf(splitter(make_doc(20_000))), split_sentences=splitter)
+    docs = [make_doc(10_000) for _ in range(3)]
+    start = time.perf_counter()
+    fast.summarize(docs[0], n_sentences=5)
+    elapsed = time.perf_counter() - start
+    print(f"\n10,000-sentence document summarized in {elapsed:.2f}s")
+    assert elapsed < 1.0, f"10k-sentence target is < 1 s, took {elapsed:.2f}s"
+    start = time.perf_counter()
+    fast.summarize_many(docs, n_sentences=5)
+    print(f"{len(docs)} such documents in one call: {time.perf_counter() - start:.2f}s")
@@ -9,6 +9,8 @@ Trainer: A high-level API for fine-tuning models, abstracting away the training
 
 # Basic Example: Sentiment Analysis with Pretrained BERT
 from transformers import pipeline
+# Note: pipeline(...) loads the model right away. For many tasks in one process see
+# NLP/huggingface_pipeline/pipeline_registry.py (lazy loading, shared weights, LRU memory budget).
 classifier = pipeline("sentiment-analysis")
 # test predictions
 texts= [
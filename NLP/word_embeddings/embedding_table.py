@@ -0,0 +1,261 @@
+'''Batched Cosine Similarity and Analogy Search over an Embedding Table
+word2vec_glove.py keeps GloVe vectors in a dict and its cosine_similarity(a, b) divides both vectors by their norm on every call.
+Comparing 100k query words with a 2M-word table that way means 200 billion Python-level calls.
+EmbeddingTable stores all vectors ONCE as a single contiguous, L2-normalized float32 (or float16) matrix plus a word -> row index.
+Cosine similarity is then a plain dot product, and a whole batch of queries is answered with a few large matrix multiplies.'''
+'''Key Concepts:
+L2-normalized rows: cos(a, b) = a.b / (|a| |b|) = a_hat . b_hat, so norms are computed once at load time, never at query time.
+Chunked matmul: scores = Q @ block.T for one block of table rows at a time; query batch and block size are chosen so the
+  score matrix, the int64 argpartition indices of the same shape and the float32 copy of a float16 block stay under max_memory_mb.
+argpartition: top-k of every score row in O(n) (no full sort); the k best of each block are merged with the k best so far.
+Analogy (3CosAdd): "a is to b as c is to ?" -> nearest rows to b_hat - a_hat + c_hat, excluding a, b and c themselves.
+GloVe parser: lines are read in big blocks, the word is cut off at the first space and all the numbers of the block are
+  parsed by a single np.loadtxt call (C reader) straight into the preallocated matrix.'''
+import json
+import os
+import time
+
+import numpy as np
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1  # all-zero vectors stay zero instead of becoming NaN
+    return vectors / norms
+
+
+def count_lines(path, buffer_size=1 << 24):
+    with open(path, "rb") as f:
+        return sum(block.count(b"\n") for block in iter(lambda: f.read(buffer_size), b""))
+
+
+def parse_block(number_lines, dim):
+    """Lines of space-separated numbers -> (n_lines, dim) float32, parsed by np.loadtxt's C reader in one call."""
+    values = np.loadtxt([line.decode() for line in number_lines], dtype=np.float32, comments=None, ndmin=2)
+    if values.shape[1] != dim:
+        raise ValueError(f"expected {dim} numbers per line, got {values.shape[1]}")
+    return values
+
+
+class EmbeddingTable:
+    def __init__(self, words, vectors, dtype=np.float32, normalized=False):
+        self.words = list(words)
+        self.word_index = {word: i for i, word in enumerate(self.words)}
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = np.ascontiguousarray(vectors if normalized else normalize_rows(vectors), dtype=dtype)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_index
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def rows(self, words):
+        """Row of every word, -1 for words that are not in the table."""
+        get = self.word_index.get
+        return np.fromiter((get(word, -1) for word in words), dtype=np.int64, count=len(words))
+
+    def vector(self, word):
+        return self.vectors[self.word_index[word]].astype(np.float32)
+
+    def cosine_similarity(self, words_a, words_b):
+        """Pairwise cosine similarity of words_a[i] and words_b[i]; NaN where a word is missing."""
+        rows_a, rows_b = self.rows(words_a), self.rows(words_b)
+        a = self.vectors[rows_a].astype(np.float32)
+        b = self.vectors[rows_b].astype(np.float32)
+        sims = np.einsum("ij,ij->i", a, b)
+        sims[(rows_a < 0) | (rows_b < 0)] = np.nan
+        return sims
+
+    def batch_sizes(self, n_queries, k, max_memory_mb):
+        """(query_batch, block_rows) that keep search() under max_memory_mb. Bytes counted:
+        the returned rows + scores (12 per result), per query batch the normalized float32 queries (2 copies) and the
+        running/merged top-k candidates, per table block the float32 copy of the block, the float32 scores AND the int64
+        argpartition indices of the same shape (12 bytes per score)."""
+        budget = max_memory_mb * 2 ** 20 * 9 // 10 - n_queries * k * 12  # 10% headroom for small temporaries
+        per_query = 8 * self.dim + 60 * k
+        query_batch = max(1, min(n_queries, budget // 4 // per_query))
+        block_rows = max(k, (budget - query_batch * per_query) // (12 * query_batch + 4 * self.dim))
+        return query_batch, block_rows
+
+    def search(self, queries, k=10, exclude=None, max_memory_mb=512):
+        """Top-k rows by cosine similarity for every query vector (Q x dim, normalized or not).
+        exclude: optional Q x m array of rows that must not be returned for each query (-1 = padding).
+        Returns (rows, scores), both Q x k, best first."""
+        queries = np.atleast_2d(queries)
+        return self._search(lambda start, stop: queries[start:stop], len(queries), k, exclude, max_memory_mb)
+
+    def _search(self, get_queries, n_queries, k, exclude, max_memory_mb):
+        # get_queries(start, stop): query vectors of one batch, built only when that batch is searched
+        k = min(k, len(self))
+        query_batch, block_rows = self.batch_sizes(n_queries, k, max_memory_mb)
+        best_rows = np.empty((n_queries, k), dtype=np.int64)
+        best_scores = np.empty((n_queries, k), dtype=np.float32)
+        for q_start in range(0, n_queries, query_batch):
+            q = normalize_rows(np.asarray(get_queries(q_start, q_start + query_batch), dtype=np.float32))
+            ex = None if exclude is None else np.asarray(exclude)[q_start:q_start + query_batch]
+            rows = np.zeros((len(q), 0), dtype=np.int64)
+            scores = np.zeros((len(q), 0), dtype=np.float32)
+            for start in range(0, len(self), block_rows):
+                block = self.vectors[start:start + block_rows]
+                block_scores = q @ block.T.astype(np.float32, copy=False)
+                if ex is not None:
+                    qi, col = np.nonzero((ex >= start) & (ex < start + len(block)))
+                    block_scores[qi, ex[qi, col] - start] = -np.inf
+                if len(block) > k:
+                    top = np.argpartition(block_scores, len(block) - k, axis=1)[:, -k:]  # no negated copy
+                else:
+                    top = np.broadcast_to(np.arange(len(block)), (len(q), len(block)))
+                # merge this block's k best with the k best so far, then keep k again
+                rows = np.concatenate([rows, top + start], axis=1)
+                scores = np.concatenate([scores, np.take_along_axis(block_scores, top, axis=1)], axis=1)
+                del top, block_scores  # free the block-sized arrays before the next block is scored
+                if rows.shape[1] > k:
+                    keep = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+                    rows = np.take_along_axis(rows, keep, axis=1)
+                    scores = np.take_along_axis(scores, keep, axis=1)
+            order = np.argsort(-scores, axis=1, kind="stable")
+            best_rows[q_start:q_start + len(q)] = np.take_along_axis(rows, order, axis=1)
+            best_scores[q_start:q_start + len(q)] = np.take_along_axis(scores, order, axis=1)
+        return best_rows, best_scores
+
+    def most_similar(self, words, k=10, max_memory_mb=512):
+        """For every query word: its k nearest words as [(word, score), ...]; None for unknown words."""
+        rows = self.rows(words)
+        found = rows[rows >= 0]
+        results = [None] * len(words)
+        if len(found):
+            top_rows, top_scores = self._search(lambda start, stop: self.vectors[found[start:stop]], len(found), k,
+                                                found[:, None], max_memory_mb)
+            for i, r, s in zip(np.flatnonzero(rows >= 0), top_rows, top_scores):
+                results[i] = [(self.words[j], float(score)) for j, score in zip(r, s)]
+        return results
+
+    def analogy(self, a, b, c, k=1, max_memory_mb=512):
+        """Batched "a is to b as c is to ?" (e.g. man : king :: woman : queen). a, b, c are equal-length word lists;
+        returns [(word, score), ...] per question, None if one of its words is unknown."""
+        rows = np.stack([self.rows(a), self.rows(b), self.rows(c)], axis=1)
+        found = np.flatnonzero((rows >= 0).all(axis=1))
+        results = [None] * len(rows)
+        if len(found):
+            abc = rows[found]
+
+            def queries(start, stop):
+                ra, rb, rc = abc[start:stop].T
+                return self.vectors[rb].astype(np.float32) - self.vectors[ra] + self.vectors[rc]
+
+            top_rows, top_scores = self._search(queries, len(found), k, abc, max_memory_mb)
+            for i, r, s in zip(found, top_rows, top_scores):
+                results[i] = [(self.words[j], float(score)) for j, score in zip(r, s)]
+        return results
+
+    @classmethod
+    def from_glove(cls, path, dtype=np.float32, max_words=None, lines_per_block=100_000):
+        """Load a GloVe/word2vec text file (word followed by its numbers on every line). A word2vec "count dim" header is skipped."""
+        with open(path, "rb") as f:
+            first = f.readline().split()
+        has_header = len(first) == 2
+        dim = int(first[1]) if has_header else len(first) - 1
+        n_words = count_lines(path) - has_header
+        if max_words is not None:
+            n_words = min(n_words, max_words)
+        words, vectors = [], np.empty((n_words, dim), dtype=dtype)
+        with open(path, "rb") as f:
+            if has_header:
+                f.readline()
+            while len(words) < n_words:
+                lines = [line for line in (f.readline() for _ in range(min(lines_per_block, n_words - len(words))))
+                         if line.strip()]
+                if not lines:
+                    break
+                parts = [line.rstrip().split(b" ", 1) for line in lines]
+                try:
+                    values = parse_block([part[1] for part in parts], dim)
+                except ValueError:
+                    # some words contain spaces (e.g. glove.840B): take the last dim fields of every line instead
+                    parts = [line.rstrip().rsplit(b" ", dim) for line in lines]
+                    parts = [(b" ".join(p[:-dim]), b" ".join(p[-dim:])) for p in parts]
+                    values = parse_block([part[1] for part in parts], dim)
+                start = len(words)
+                vectors[start:start + len(parts)] = normalize_rows(values)
+                words.extend(part[0].decode("utf-8", errors="replace") for part in parts)
+        return cls(words, vectors[:len(words)], dtype=dtype, normalized=True)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        with open(os.path.join(path, "words.json"), "w", encoding="utf-8") as f:
+            json.dump(self.words, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        with open(os.path.join(path, "words.json"), encoding="utf-8") as f:
+            words = json.load(f)
+        table = cls.__new__(cls)
+        table.words = words
+        table.word_index = {word: i for i, word in enumerate(words)}
+        table.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        return table
+
+
+if __name__ == "__main__":
+    import tempfile
+    import tracemalloc
+
+    # the toy GloVe vectors of word2vec_glove.py
+    glove = {
+        "cat": np.array([0.2, 0.1, 0.7]),
+        "kitten": np.array([0.21, 0.09, 0.75]),
+        "dog": np.array([0.27, 0.19, 0.60]),
+        "puppy": np.array([0.25, 0.12, 0.69]),
+    }
+    table = EmbeddingTable(glove.keys(), list(glove.values()))
+    print("cat ~ kitten, cat ~ dog:", table.cosine_similarity(["cat", "cat"], ["kitten", "dog"]))
+    print("Nearest to 'cat':", table.most_similar(["cat"], k=2)[0])
+    print("dog : puppy :: cat : ?", table.analogy(["dog"], ["puppy"], ["cat"])[0])
+
+    # synthetic 200k x 100 table written as a GloVe text file, 10k query words
+    rng = np.random.default_rng(0)
+    n_words, dim = 200_000, 100
+    path = os.path.join(tempfile.mkdtemp(prefix="glove-"), "glove.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        for i, vector in enumerate(rng.standard_normal((n_words, dim)).astype(np.float32)):
+            f.write(f"w{i} " + " ".join(f"{x:.5f}" for x in vector) + "\n")
+
+    start = time.perf_counter()
+    big = EmbeddingTable.from_glove(path)
+    print(f"\nParsed {len(big):,} x {big.dim} GloVe vectors in {time.perf_counter() - start:.1f}s")
+
+    queries = [f"w{i}" for i in rng.integers(0, n_words, 10_000)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = big.most_similar(queries, k=10, max_memory_mb=64)
+    elapsed = time.perf_counter() - start
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    print(f"Batched top-10 for {len(queries):,} words: {elapsed:.1f}s ({len(queries) / elapsed:,.0f} words/s), "
+          f"peak {peak_mb:.0f} MB")
+    assert peak_mb <= 64, f"memory ceiling of 64 MB exceeded: {peak_mb:.0f} MB"
+
+    glove_dict = {word: big.vector(word) for word in big.words[:20_000]}
+
+    def cosine_similarity(a, b):  # the helper of word2vec_glove.py
+        a = a / np.linalg.norm(a)
+        b = b / np.linalg.norm(b)
+        return np.dot(a, b)
+
+    start = time.perf_counter()
+    for word in queries[:5]:
+        sorted(((cosine_similarity(glove_dict[word] if word in glove_dict else big.vector(word), v), w)
+                for w, v in glove_dict.items()), reverse=True)[:10]
+    per_word = (time.perf_counter() - start) / 5 * n_words / len(glove_dict)
+    print(f"Dict scan + cosine_similarity(): ~{1 / per_word:.1f} words/s")
+
+    half = EmbeddingTable(big.words, big.vectors, dtype=np.float16, normalized=True)
+    print("float16 nearest to", queries[0], half.most_similar(queries[:1], k=3)[0])
+    print("float32 nearest to", queries[0], results[0][:3])
+    print(f"float16 table: {half.vectors.nbytes / 1e6:.0f} MB instead of {big.vectors.nbytes / 1e6:.0f} MB")
@@ -0,0 +1,196 @@
+'''Word2Vec on Corpora that do not fit in Memory
+word2vec_glove.py tokenizes every sentence into one Python list and passes it to Word2Vec(tokenized, ...).
+For a 30 GB corpus that list alone needs several times the RAM of the text, and it is rebuilt from scratch on every run.
+tokenize_shards() tokenizes sharded text files ONCE, in worker processes, and stores every sentence as integer token IDs
+(.npy shards + a frequency-sorted vocabulary). TokenIdCorpus streams those shards back as many times as gensim asks for
+(one pass per epoch, never re-tokenizing), and the trained vectors are exported so serving processes memory-map them.'''
+'''Key Concepts:
+Restartable iterable: gensim iterates the corpus once per epoch, so the corpus must be an object whose __iter__ starts over
+  (a plain generator is exhausted after the first pass). TokenIdCorpus re-opens its memory-mapped shards on every __iter__.
+Token-ID shards: ids-XXXXX.npy (int32 token IDs, all sentences concatenated) + offsets-XXXXX.npy (sentence boundaries).
+  4 bytes per token instead of a Python str object per token.
+Local -> global vocabulary: every worker numbers the words of its own shard; the main process merges the word counts,
+  sorts the vocabulary by frequency and remaps each shard with one numpy lookup (no second tokenization pass).
+build_vocab_from_freq: the word counts are already known, so gensim's own vocabulary scan over the corpus is skipped.
+Memory-mapped KeyedVectors: vectors (and their norms) are saved as separate .npy files; KeyedVectors.load(path, mmap="r")
+  maps them read-only, so every serving process shares the same physical pages.
+Restart: shard files are written to a temporary name and renamed when complete; a re-run reuses finished shards.'''
+import gzip
+import json
+import os
+import re
+import time
+from array import array
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)?|[^\w\s]")
+
+
+def simple_tokenize(text):
+    """Lowercased words and punctuation marks, close to word_tokenize(sent.lower()) at a fraction of the cost."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def open_text(path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+
+def save_npy(path, array_):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array_)
+    os.replace(path + ".tmp", path)  # a shard file is either complete or absent
+
+
+def tokenize_shard(path, out_dir, name, tokenizer):
+    """Worker: one sentence per line -> local token IDs, local vocabulary and counts, written to out_dir."""
+    local_path = os.path.join(out_dir, f"local-{name}.npy")
+    vocab_path = os.path.join(out_dir, f"local-{name}.json")
+    if not os.path.exists(local_path):
+        vocab = {}
+        ids, offsets = array("i"), array("q", [0])
+        with open_text(path) as f:
+            for line in f:
+                tokens = tokenizer(line)
+                if not tokens:
+                    continue
+                ids.extend([vocab.setdefault(token, len(vocab)) for token in tokens])
+                offsets.append(len(ids))
+        with open(vocab_path, "w", encoding="utf-8") as f:
+            json.dump(list(vocab), f, ensure_ascii=False)
+        save_npy(os.path.join(out_dir, f"offsets-{name}.npy"), np.frombuffer(offsets, dtype=np.int64))
+        save_npy(local_path, np.frombuffer(ids, dtype=np.int32))  # written last: marks the shard as done
+    with open(vocab_path, encoding="utf-8") as f:
+        words = json.load(f)
+    counts = np.bincount(np.load(local_path, mmap_mode="r"), minlength=len(words))
+    return words, counts
+
+
+def tokenize_shards(input_paths, out_dir, tokenizer=simple_tokenize, n_jobs=None):
+    """Tokenize every input shard (text file, optionally .gz, one sentence per line) into out_dir. Returns a TokenIdCorpus.
+    tokenizer must be a module-level function (it is sent to the worker processes)."""
+    if os.path.exists(os.path.join(out_dir, "meta.json")):
+        return TokenIdCorpus(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    names = [f"{i:05d}" for i in range(len(input_paths))]
+    with Pool(n_jobs) as pool:
+        local = pool.starmap(tokenize_shard, [(path, out_dir, name, tokenizer) for path, name in zip(input_paths, names)])
+
+    # merge the local vocabularies: global IDs sorted by frequency (ID 0 = most frequent word)
+    totals = Counter()
+    for words, counts in local:
+        totals.update(dict(zip(words, counts.tolist())))
+    vocab = [word for word, _ in totals.most_common()]
+    word_id = {word: i for i, word in enumerate(vocab)}
+    for name, (words, _) in zip(names, local):
+        remap = np.array([word_id[word] for word in words], dtype=np.int32)
+        local_path = os.path.join(out_dir, f"local-{name}.npy")
+        save_npy(os.path.join(out_dir, f"ids-{name}.npy"), remap[np.load(local_path)])
+        os.remove(local_path)
+        os.remove(os.path.join(out_dir, f"local-{name}.json"))
+
+    n_sentences = sum(len(np.load(os.path.join(out_dir, f"offsets-{name}.npy"), mmap_mode="r")) - 1 for name in names)
+    np.save(os.path.join(out_dir, "counts.npy"), np.array([totals[word] for word in vocab], dtype=np.int64))
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(os.path.join(out_dir, "meta.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({"shards": names, "n_sentences": n_sentences, "n_tokens": int(sum(totals.values())),
+                   "input_paths": list(input_paths)}, f)
+    os.replace(os.path.join(out_dir, "meta.json.tmp"), os.path.join(out_dir, "meta.json"))  # commit point
+    return TokenIdCorpus(out_dir)
+
+
+class TokenIdCorpus:
+    """Re-iterable corpus over token-ID shards: every __iter__ yields each sentence as a list of words again."""
+
+    def __init__(self, out_dir, block_size=10_000):
+        with open(os.path.join(out_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(out_dir, "vocab.json"), encoding="utf-8") as f:
+            self.words = np.array(json.load(f), dtype=object)  # ID -> word, looked up for many IDs at once
+        self.counts = np.load(os.path.join(out_dir, "counts.npy"))
+        self.out_dir = out_dir
+        self.block_size = block_size
+
+    def __len__(self):
+        return self.meta["n_sentences"]
+
+    def __iter__(self):
+        for name in self.meta["shards"]:
+            ids = np.load(os.path.join(self.out_dir, f"ids-{name}.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(self.out_dir, f"offsets-{name}.npy"))
+            for start in range(0, len(offsets) - 1, self.block_size):
+                bounds = offsets[start:start + self.block_size + 1]
+                words = self.words[ids[bounds[0]:bounds[-1]]].tolist()  # one vectorized lookup per block
+                bounds = bounds - bounds[0]
+                for i in range(len(bounds) - 1):
+                    yield words[bounds[i]:bounds[i + 1]]
+
+    def word_freq(self):
+        return dict(zip(self.words.tolist(), self.counts.tolist()))
+
+
+def train_word2vec(corpus, vector_size=100, window=5, min_count=5, sg=1, workers=None, epochs=5, **kwargs):
+    """Word2Vec on a TokenIdCorpus: vocabulary from the stored counts, then `epochs` streamed passes with `workers` threads."""
+    from gensim.models import Word2Vec
+    model = Word2Vec(vector_size=vector_size, window=window, min_count=min_count, sg=sg,
+                     workers=workers or os.cpu_count(), **kwargs)
+    model.build_vocab_from_freq(corpus.word_freq(), corpus_count=len(corpus))
+    model.train(corpus, total_examples=len(corpus), total_words=corpus.meta["n_tokens"], epochs=epochs)
+    return model
+
+
+def export_keyed_vectors(model, path):
+    """Save model.wv so that load_keyed_vectors() can memory-map it; norms are stored too, so most_similar()
+    does not recompute (and copy) them in every serving process."""
+    wv = model.wv if hasattr(model, "wv") else model
+    wv.fill_norms()
+    wv.save(path, separately=["vectors", "norms"])
+    return path
+
+
+def load_keyed_vectors(path):
+    from gensim.models import KeyedVectors
+    return KeyedVectors.load(path, mmap="r")
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    # synthetic corpus: 4 shards x 50,000 sentences built from the sentences of word2vec_glove.py
+    random.seed(0)
+    sentences = [
+        "A cat chases a mouse.",
+        "The quick brown fox jumps over the lazy dog.",
+        "Dogs and cats are great pets.",
+        "I love my pet dog.",
+        "The kitten sleeps while the puppy plays with the dog.",
+    ]
+    data_dir = tempfile.mkdtemp(prefix="w2v-")
+    input_paths = []
+    for shard in range(4):
+        path = os.path.join(data_dir, f"shard-{shard}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(50_000):
+                f.write(random.choice(sentences) + "\n")
+        input_paths.append(path)
+
+    start = time.perf_counter()
+    corpus = tokenize_shards(input_paths, os.path.join(data_dir, "tokens"))
+    print(f"Tokenized {len(corpus):,} sentences / {corpus.meta['n_tokens']:,} tokens once in "
+          f"{time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    corpus = tokenize_shards(input_paths, os.path.join(data_dir, "tokens"))  # re-run: shards are reused
+    print(f"Re-run (shards already on disk): {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    model = train_word2vec(corpus, vector_size=50, window=2, min_count=1, sg=1, epochs=5)
+    print(f"Word2Vec, 5 streamed epochs, {model.workers} workers: {time.perf_counter() - start:.1f}s")
+
+    path = export_keyed_vectors(model, os.path.join(data_dir, "vectors.kv"))
+    wv = load_keyed_vectors(path)
+    print(f"Memory-mapped vectors: {type(wv.vectors).__name__}, {wv.vectors.shape}")
+    print("Words similar to 'cat':", wv.most_similar("cat", topn=3))
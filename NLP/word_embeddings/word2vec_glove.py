@@ -22,6 +22,7 @@ tokenized = [word_tokenize(sent.lower()) for sent in sentences]
 
 # Train word2vec on corpus
 model = Word2Vec(tokenized,vector_size=50,window=2,min_count=1,sg=1) # sg=1 for skip gram
+# (corpora larger than RAM: streamed_corpus.py tokenizes sharded files once and streams token-ID shards to gensim)
 print("\nVocabulary:",list(model.wv.key_to_index.keys()))
 
 # Find similarity between "cat" and other words
@@ -47,6 +48,7 @@ def cosine_similarity(a,b):
     return np.dot(a,b)
 print("\nCosine similarity between 'cat' and 'kitten':", cosine_similarity(glove['cat'], glove['kitten']))
 print("Cosine similarity between 'cat' and 'dog':", cosine_similarity(glove['cat'], glove['dog']))
+# (full GloVe tables, many queries: embedding_table.py keeps one normalized matrix and answers top-k / analogies in batches)
 
 # ---- Visualizing Word Embeddings ---
 '''With hundreds of dimensions, visualizing embeddings directly is hard. We use t-SNE or PCA to reduce dimensions for plotting.'''
@@ -68,6 +68,7 @@ models = {
     'Logistic Regression':Pipeline([('tfidf',TfidfVectorizer(max_features=1000,stop_words='english')),('lr',LogisticRegression(random_state=42)) ]),
     'SVM':Pipeline([('tfidf',TfidfVectorizer(max_features=1000,stop_words='english')),('svm',SVC(random_state=42))])
 }
+# (millions of emails: spam_training.py vectorizes once and fits the models in parallel, or trains online with partial_fit)
 
 # train and evaluate models
 results = {}
@@ -99,6 +100,7 @@ test_emails = [
 print(f"\n Testing New Emails : ")
 print("-"*30)
 
+# (serving: spam_scoring.py scores whole batches with one transform + one predict_proba, from a memory-mapped artifact)
 for email in test_emails:
     clean_email=preprocess_text(email)
     prediction = models[best_model].predict([clean_email])[0]